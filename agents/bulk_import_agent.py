@@ -0,0 +1,69 @@
+import sys
+import os
+import logging
+import argparse
+import datetime
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.pubmed_bulk import find_dump_files, import_dumps
+from utils import run_catalog
+from utils.campaign import CURRENT as CAMPAIGN
+from utils.logging_setup import setup_logging, set_run_id
+
+setup_logging("bulk_import")
+logger = logging.getLogger("BulkImportAgent")
+
+def load_config():
+    return CAMPAIGN.load_config()
+
+def load_keywords():
+    return CAMPAIGN.load_keywords()
+
+def parse_date(value):
+    if not value:
+        return None
+    return datetime.datetime.strptime(str(value), "%Y-%m-%d").date()
+
+def main():
+    bulk_config = load_config().get('bulk_import', {})
+
+    parser = argparse.ArgumentParser(description="Seed the campaign's raw_papers from local PubMed baseline/update dumps")
+    parser.add_argument("source_dir", nargs="?", default=bulk_config.get('source_dir'))
+    parser.add_argument("--from", dest="date_from", default=bulk_config.get('date_from'))
+    parser.add_argument("--to", dest="date_to", default=bulk_config.get('date_to'))
+    parser.add_argument("--workers", type=int, default=bulk_config.get('workers'))
+    args = parser.parse_args()
+
+    logger.info("Starting Bulk Import Agent...")
+
+    if not args.source_dir:
+        logger.error("No dump directory given (bulk_import.source_dir or first argument).")
+        return
+    paths = find_dump_files(args.source_dir)
+    if not paths:
+        logger.warning(f"No pubmed*.xml.gz files found in {args.source_dir}")
+        return
+
+    keywords = load_keywords()
+    run_id = run_catalog.start_run("discovery", keywords=keywords)
+    set_run_id(run_id)
+    logger.info(f"Importing {len(paths)} dump files from {args.source_dir}")
+
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_file = CAMPAIGN.path(f"raw_papers/papers_{timestamp}.json")
+    count = import_dumps(
+        paths,
+        keywords,
+        output_file,
+        date_from=parse_date(args.date_from),
+        date_to=parse_date(args.date_to),
+        workers=args.workers
+    )
+
+    logger.info(f"Saved {count} unique papers to {output_file}")
+    run_catalog.finish_run(run_id, artifact_path=output_file, record_count=count)
+
+if __name__ == "__main__":
+    main()
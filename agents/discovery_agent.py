@@ -3,33 +3,74 @@ import os
 import json
 import logging
 import datetime
+import functools
 
 # Add parent directory to path to allow importing config and utils
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.pubmed_api import PubMedAPI
-import yaml
-
-# Setup logging
-log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data/logs")
-os.makedirs(log_dir, exist_ok=True)
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(log_dir, "bbrc_agent.log"), mode='a', encoding='utf-8'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+from utils import run_catalog
+from utils.discovery_checkpoint import DiscoveryCheckpoint
+from utils.pmid_cache import PaperCache
+from utils.campaign import CURRENT as CAMPAIGN
+from utils.logging_setup import setup_logging, set_run_id
+from utils.work_queue import queue_from_config, new_group, iter_group, DONE
+
+setup_logging("discovery")
 logger = logging.getLogger("DiscoveryAgent")
 
 def load_config():
-    with open("config/settings.yaml", "r") as f:
-        return yaml.safe_load(f)
+    return CAMPAIGN.load_config()
 
 def load_keywords():
-    with open("config/keywords.json", "r") as f:
-        return json.load(f)
+    return CAMPAIGN.load_keywords()
+
+def make_pubmed(discovery_config, **overrides):
+    options = {
+        'parse_workers': discovery_config.get('parse_workers', 0),
+        'batch_size': discovery_config.get('fetch_batch_size', 200),
+        'max_retries': discovery_config.get('max_retries', 5),
+        'fetch_mode': discovery_config.get('fetch_mode', 'full'),
+        'requests_per_second': discovery_config.get('requests_per_second', 3)
+    }
+    options.update(overrides)
+    return PubMedAPI(email=discovery_config['email'], **options)
+
+FETCH_TASK = "discovery.fetch"
+
+def fetch_task(payload, campaign):
+    """Worker side of a queued discovery batch: fetch and parse one slice of PMIDs."""
+    discovery_config = campaign.load_config()['discovery']
+    pubmed = make_pubmed(discovery_config, parse_workers=0, batch_size=max(len(payload['ids']), 1))
+    try:
+        return [paper for _, papers in pubmed.iter_batches(payload['ids']) for paper in papers]
+    finally:
+        pubmed.close()
+
+def iter_queued_batches(work_queue, pubmed, id_list, skip=(), poll_interval=1.0):
+    """
+    Like pubmed.iter_batches, but each batch is a queue task fetched by
+    whichever worker leases it. Yields each batch as soon as it is fetched,
+    so the caller can checkpoint it, then raises if any could not be.
+    """
+    group = new_group("discovery")
+    work_queue.enqueue(group, FETCH_TASK, [
+        {'index': index, 'ids': id_list[start:start + pubmed.batch_size]}
+        for index, start in enumerate(range(0, len(id_list), pubmed.batch_size))
+        if index not in skip
+    ], campaign=CAMPAIGN.name)
+    failed = []
+    try:
+        for task in iter_group(work_queue, group, {FETCH_TASK: fetch_task}, poll_interval=poll_interval):
+            if task.state == DONE:
+                yield task.payload['index'], task.result
+            else:
+                failed.append(task)
+    finally:
+        work_queue.cancel(group)
+        work_queue.purge(group)
+    if failed:
+        raise RuntimeError(f"{len(failed)} queued batches failed, last error: {failed[-1].error}")
 
 def main():
     logger.info("Starting Research Discovery Agent...")
@@ -37,31 +78,96 @@ def main():
     config = load_config()
     keywords = load_keywords()
     
-    pubmed = PubMedAPI(email=config['discovery']['email'])
+    discovery_config = config['discovery']
+    pubmed = make_pubmed(discovery_config)
+    run_id = run_catalog.start_run("discovery", keywords=keywords)
+    set_run_id(run_id)
+
+    DiscoveryCheckpoint.prune_stale()
+    checkpoint = DiscoveryCheckpoint.for_run(keywords, {
+        'days_back': discovery_config['days_back'],
+        'max_results': discovery_config['max_results'],
+        'batch_size': pubmed.batch_size
+    }, run_id=run_id)
+    if checkpoint.resumed:
+        logger.info(f"Resuming run {checkpoint.run_id} from checkpoint {checkpoint.path}")
+    paper_cache = PaperCache()
+    work_queue = queue_from_config(config)
+    if work_queue is not None:
+        batches = functools.partial(
+            iter_queued_batches, work_queue, pubmed, poll_interval=config['queue'].get('poll_interval', 1.0)
+        )
+    else:
+        batches = pubmed.iter_batches
     
-    all_papers = []
+    incomplete = []
     
     for keyword in keywords:
+        state = checkpoint.keyword(keyword)
+        if state['complete']:
+            logger.info(f"Already fetched '{keyword}' (checkpoint)")
+            continue
+
         logger.info(f"Searching for: {keyword}")
-        papers = pubmed.search_papers(
-            query=keyword,
-            days_back=config['discovery']['days_back'],
-            max_results=config['discovery']['max_results']
-        )
-        logger.info(f"Found {len(papers)} papers for '{keyword}'")
-        all_papers.extend(papers)
-        
-    # Deduplicate by ID
-    unique_papers = {p['id']: p for p in all_papers}.values()
+        try:
+            found = 0
+            if state['ids'] is None:
+                ids = paper_cache.get_search(keyword, discovery_config['days_back'], discovery_config['max_results'])
+                if ids is None:
+                    ids = pubmed.search_ids(
+                        query=keyword,
+                        days_back=discovery_config['days_back'],
+                        max_results=discovery_config['max_results']
+                    )
+                    paper_cache.put_search(keyword, discovery_config['days_back'], discovery_config['max_results'], ids)
+                # Papers another campaign (or an earlier run) already fetched
+                cached = paper_cache.get_many(ids)
+                if cached:
+                    checkpoint.add_batch(keyword, 'cached', list(cached.values()))
+                    found += len(cached)
+                    logger.info(f"{len(cached)} of {len(ids)} papers for '{keyword}' served from the PMID cache")
+                checkpoint.set_ids(keyword, [pmid for pmid in ids if pmid not in cached])
+            for index, papers in batches(state['ids'], skip=set(state['done_batches'])):
+                paper_cache.put_many(papers)
+                checkpoint.add_batch(keyword, index, papers)
+                found += len(papers)
+            checkpoint.mark_complete(keyword)
+            logger.info(f"Found {found} papers for '{keyword}'")
+        except Exception as e:
+            logger.error(f"Search for '{keyword}' incomplete, will resume on next run: {e}")
+            incomplete.append(keyword)
+    pubmed.close()
+    paper_cache.close()
+    if work_queue is None:
+        logger.info(f"Received {pubmed.bytes_received / 1024:.0f} KB from NCBI ({pubmed.fetch_mode} mode)")
+    if work_queue is not None:
+        work_queue.close()
+
+    # Papers of the keywords that finished; a failed keyword's batches stay in
+    # the checkpoint for the next run
+    complete = checkpoint.complete_keywords()
+    unique_papers = {p['id']: p for p in checkpoint.iter_papers(keywords=complete)}.values()
     
     # Save results
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_file = f"data/raw_papers/papers_{timestamp}.json"
+    output_file = CAMPAIGN.path(f"raw_papers/papers_{timestamp}.json")
     
     with open(output_file, "w") as f:
         json.dump(list(unique_papers), f, indent=2)
         
     logger.info(f"Saved {len(unique_papers)} unique papers to {output_file}")
 
+    if incomplete:
+        # Profiling picks this up like a completed run; the checkpoint stays for the missing keywords
+        run_catalog.finish_run(run_id, artifact_path=output_file, record_count=len(unique_papers), status='incomplete')
+        logger.warning(f"Discovery incomplete for {len(incomplete)} keywords ({', '.join(incomplete)}); "
+                       f"saved the other {len(complete)}. Re-run to fetch only the missing batches.")
+    else:
+        run_catalog.finish_run(run_id, artifact_path=output_file, record_count=len(unique_papers))
+        checkpoint.clear()
+
+    keep_runs = config.get('storage', {}).get('keep_runs', 10)
+    run_catalog.compact_snapshots(keep_runs=keep_runs)
+
 if __name__ == "__main__":
     main()
@@ -7,23 +7,17 @@ import re
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data/logs")
-os.makedirs(log_dir, exist_ok=True)
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(log_dir, "bbrc_agent.log"), mode='a', encoding='utf-8'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+from utils.logging_setup import setup_logging
+from utils.campaign import CURRENT as CAMPAIGN
+
+setup_logging("email")
 logger = logging.getLogger("EmailDiscoveryAgent")
 
 EMAIL_REGEX = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
 
 def load_profiles():
     # Load the output from Agent 2
-    input_file = "data/authors/profiles_latest.json"
+    input_file = CAMPAIGN.path("authors/profiles_latest.json")
     if not os.path.exists(input_file):
         logger.warning(f"{input_file} not found.")
         return []
@@ -70,7 +64,7 @@ def main():
     logger.info(f"Found emails for {len(enriched_profiles)} authors.")
     
     # Save results
-    output_file = "data/authors/profiles_with_emails.json"
+    output_file = CAMPAIGN.path("authors/profiles_with_emails.json")
     with open(output_file, 'w') as f:
         json.dump(enriched_profiles, f, indent=2)
         
@@ -3,26 +3,21 @@ import os
 import json
 import logging
 import time
-import glob
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data/logs")
-os.makedirs(log_dir, exist_ok=True)
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(log_dir, "bbrc_agent.log"), mode='a', encoding='utf-8'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+from utils import run_catalog
+from utils.campaign import CURRENT as CAMPAIGN
+from utils.logging_setup import setup_logging
+
+setup_logging("logging")
 logger = logging.getLogger("LoggingAgent")
 
 def generate_summary():
     summary = {
         'timestamp': time.ctime(),
+        'campaign': CAMPAIGN.name,
         'papers_found': 0,
         'authors_profiled': 0,
         'emails_found': 0,
@@ -31,31 +26,33 @@ def generate_summary():
     }
     
     # Check papers
-    paper_files = glob.glob("data/raw_papers/*.json")
-    if paper_files:
-        latest = max(paper_files, key=os.path.getctime)
-        with open(latest, 'r') as f:
-            summary['papers_found'] = len(json.load(f))
+    latest_run = run_catalog.latest_run("discovery")
+    if latest_run:
+        if latest_run['record_count'] is not None:
+            summary['papers_found'] = latest_run['record_count']
+        elif latest_run['artifact_path'] and os.path.exists(latest_run['artifact_path']):
+            with open(latest_run['artifact_path'], 'r') as f:
+                summary['papers_found'] = len(json.load(f))
             
     # Check authors
-    if os.path.exists("data/authors/profiles_latest.json"):
-        with open("data/authors/profiles_latest.json", 'r') as f:
+    if os.path.exists(CAMPAIGN.path("authors/profiles_latest.json")):
+        with open(CAMPAIGN.path("authors/profiles_latest.json"), 'r') as f:
             summary['authors_profiled'] = len(json.load(f))
             
     # Check emails found
-    if os.path.exists("data/authors/profiles_with_emails.json"):
-        with open("data/authors/profiles_with_emails.json", 'r') as f:
+    if os.path.exists(CAMPAIGN.path("authors/profiles_with_emails.json")):
+        with open(CAMPAIGN.path("authors/profiles_with_emails.json"), 'r') as f:
             data = json.load(f)
             summary['emails_found'] = sum(1 for p in data if p.get('emails'))
             
     # Check validated
-    if os.path.exists("data/validated_list/ready_to_send.json"):
-        with open("data/validated_list/ready_to_send.json", 'r') as f:
+    if os.path.exists(CAMPAIGN.path("validated_list/ready_to_send.json")):
+        with open(CAMPAIGN.path("validated_list/ready_to_send.json"), 'r') as f:
             summary['emails_validated'] = len(json.load(f))
             
     # Check sent
-    if os.path.exists("data/logs/sent_emails.csv"):
-        with open("data/logs/sent_emails.csv", 'r') as f:
+    if os.path.exists(CAMPAIGN.path("logs/sent_emails.csv")):
+        with open(CAMPAIGN.path("logs/sent_emails.csv"), 'r') as f:
             summary['emails_sent'] = sum(1 for line in f)
             
     return summary
@@ -73,7 +70,7 @@ def main():
     print("============================")
     
     # Append to history log
-    with open("data/logs/execution.log", "a") as f:
+    with open(CAMPAIGN.path("logs/execution.log"), "a") as f:
         f.write(json.dumps(summary) + "\n")
 
 if __name__ == "__main__":
@@ -2,42 +2,44 @@ import sys
 import os
 import json
 import logging
-import smtplib
-import time
-import yaml
+import datetime
 from email.message import EmailMessage
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
 
-log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data/logs")
-os.makedirs(log_dir, exist_ok=True)
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(log_dir, "bbrc_agent.log"), mode='a', encoding='utf-8'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+from utils.send_journal import SendJournal
+from utils.send_scheduler import SendScheduler, relays_from_config, RELAY_ERROR
+from utils.scoring import rank_candidates, load_domain_engagement
+import database
+from utils.campaign import CURRENT as CAMPAIGN
+from utils.logging_setup import setup_logging
+from utils.work_queue import queue_from_config, new_group, iter_group, DONE
+
+setup_logging("outreach")
 logger = logging.getLogger("OutreachAgent")
 
+VALIDATED_LIST = CAMPAIGN.path("validated_list/ready_to_send.json")
+SENT_LOG = CAMPAIGN.path("logs/sent_emails.csv")
+
 def load_config():
-    with open("config/settings.yaml", "r") as f:
-        return yaml.safe_load(f)
+    return CAMPAIGN.load_config()
 
 def load_template():
-    with open("config/templates/cfp_email.txt", "r") as f:
-        return f.read()
+    return CAMPAIGN.load_template()
+
+def load_keywords():
+    return CAMPAIGN.load_keywords()
 
 def load_validated_list():
-    input_file = "data/validated_list/ready_to_send.json"
+    input_file = VALIDATED_LIST
     if not os.path.exists(input_file):
         return []
     with open(input_file, 'r') as f:
         return json.load(f)
 
-def send_email(config, recipient, template):
+def build_message(config, recipient, template, sender_email=None):
     msg = EmailMessage()
     
     # Personalize
@@ -49,56 +51,176 @@ def send_email(config, recipient, template):
     
     msg.set_content(body)
     msg['Subject'] = config['emailTemplateSubject'] # Should be in config, fallback if not
-    msg['From'] = config['outreach']['sender_email']
+    msg['From'] = sender_email or config['outreach']['sender_email']
     msg['To'] = recipient['email']
-    
+    return msg
+
+def send_email(config, recipient, template):
+    """Sends a single email through the first configured relay."""
+    relay = relays_from_config(config['outreach'])[0]
     try:
-        if config['outreach']['smtp_port'] == 465:
-            server = smtplib.SMTP_SSL(config['outreach']['smtp_server'], 465)
-        else:
-            server = smtplib.SMTP(config['outreach']['smtp_server'], 587)
-            server.starttls()
-            
-        server.login(config['outreach']['sender_email'], os.environ.get('SMTP_PASSWORD', 'password_placeholder'))
-        server.send_message(msg)
-        server.quit()
+        relay.send(build_message(config, recipient, template, relay.sender_email))
         logger.info(f"Sent email to {recipient['email']}")
         return True
     except Exception as e:
         logger.error(f"Failed to send to {recipient['email']}: {e}")
         return False
+    finally:
+        relay.reset()
+
+SEND_TASK = "outreach.send"
+
+# (campaign, relay index) -> Relay, kept for the worker's lifetime so a relay's
+# pacing, and whether it was stopped, carry over from one batch to the next
+_relays = {}
+
+def send_task(payload, campaign):
+    """
+    Worker side of a queued send: delivers recipients through the one relay
+    the task was assigned, and returns [(email, success, error, outcome)].
+    """
+    config = campaign.load_config()
+    template = campaign.load_template()
+    key = (campaign.name, payload['relay'])
+    relay = _relays.get(key)
+    if relay is None:
+        relay = _relays[key] = relays_from_config(config['outreach'])[payload['relay']]
+    scheduler = SendScheduler.from_config(config['outreach'], relays=[relay])
+    return scheduler.run(
+        payload['recipients'],
+        lambda candidate, relay: build_message(config, candidate, template, relay.sender_email)
+    )
+
+def send_queued(work_queue, journal, batch, relays, on_result, in_doubt, poll_interval=1.0):
+    """
+    Sends a claimed batch through queue workers, one task per relay index in
+    relays so every relay is still paced by a single scheduler. Send tasks
+    are never handed out twice: the batch is marked 'sending' before it is
+    enqueued, and in_doubt is left holding the emails of tasks that were
+    leased but did not report back, which may or may not have gone out.
+    Returns the relay indexes that were stopped by a relay error.
+    """
+    group = new_group("outreach")
+    chunks = [batch[i::len(relays)] for i in range(len(relays))]
+    journal.start([c['email'] for c in batch])
+    in_doubt.update(c['email'] for c in batch)
+    work_queue.enqueue(group, SEND_TASK, [
+        {'relay': relay, 'recipients': chunk} for relay, chunk in zip(relays, chunks) if chunk
+    ], campaign=CAMPAIGN.name, max_attempts=1)
+    stopped = set()
+    try:
+        # Journaled as each task reports back, not when the whole batch is through
+        for task in iter_group(work_queue, group, {SEND_TASK: send_task}, poll_interval=poll_interval):
+            if task.state == DONE:
+                for result in task.result:
+                    on_result(tuple(result))
+                    in_doubt.discard(result[0])
+                    if result[3] == RELAY_ERROR:
+                        stopped.add(task.payload['relay'])
+    finally:
+        # Nobody started these: safe to hand back to the journal
+        for task in work_queue.cancel(group):
+            emails = [c['email'] for c in task.payload['recipients']]
+            journal.release(emails, started=True)
+            in_doubt.difference_update(emails)
+        work_queue.purge(group)
+    return stopped
 
 def main():
     logger.info("Starting Outreach Agent...")
     
     config = load_config()
     template = load_template()
-    candidates = load_validated_list()
-    
-    if not candidates:
+    journal = SendJournal(max_retries=config['outreach'].get('retry_attempts', 3),
+                          retry_delay=config['outreach'].get('retry_delay', 3600))
+
+    requeued, interrupted = journal.recover_in_flight()
+    if requeued:
+        logger.info(f"Returned {requeued} claimed but unsent recipients from a previous run to the queue.")
+    if interrupted:
+        logger.warning(f"{interrupted} sends were in flight during a previous crash; marked unknown, not retried.")
+
+    def load_ranked():
+        ranked = rank_candidates(
+            load_validated_list(),
+            load_keywords(),
+            scoring_config=config.get('scoring'),
+            engagement=load_domain_engagement()
+        )
+        if ranked:
+            logger.info(f"Ranked {len(ranked)} candidates (top score {ranked[0]['score']})")
+        return ranked
+
+    added = journal.enqueue_file(VALIDATED_LIST, load_ranked)
+    pending = journal.pending_count()
+    if not pending:
         logger.info("No candidates to email.")
+        journal.close()
         return
 
     count = 0
     max_daily = config['outreach']['max_daily_emails']
+    batch_size = config['outreach'].get('batch_size', 50)
+    scheduler = SendScheduler.from_config(config['outreach'])
+    work_queue = queue_from_config(config)
     
-    logger.info(f"Loaded {len(candidates)} candidates. Processing...")
+    logger.info(f"Queued {added} new candidates, {pending} pending. Sending via {len(scheduler.relays)} relay(s)...")
     
-    for candidate in candidates:
-        if count >= max_daily:
-            logger.info("Daily limit reached.")
-            break
-            
-        success = send_email(config, candidate, template)
-        
-        if success:
-            count += 1
-            # Log successful send to separate file
-            with open("data/logs/sent_emails.csv", "a") as f:
-                f.write(f"{datetime.datetime.now()},{candidate['email']}\n")
-                
-            time.sleep(config['outreach']['delay_seconds'])
+    healthy = list(range(len(scheduler.relays)))
+    with open(SENT_LOG, "a") as sent_log:
+        while count < max_daily and healthy:
+            batch = journal.claim(min(batch_size, max_daily - count))
+            if not batch:
+                break
+
+            results = []
+            in_doubt = set()
+
+            def on_result(result):
+                nonlocal count
+                journal.complete([result])
+                results.append(result)
+                email, success, _, _ = result
+                if success:
+                    count += 1
+                    logger.info(f"Sent email to {email}")
+                    # Log successful send to separate file
+                    sent_log.write(f"{datetime.datetime.now()},{email}\n")
+
+            try:
+                if work_queue is not None:
+                    stopped = send_queued(work_queue, journal, batch, healthy, on_result, in_doubt,
+                                          poll_interval=config['queue'].get('poll_interval', 1.0))
+                    healthy = [i for i in healthy if i not in stopped]
+                else:
+                    scheduler.run(
+                        batch,
+                        lambda candidate, relay: build_message(config, candidate, template, relay.sender_email),
+                        on_result=on_result,
+                        on_start=lambda email: journal.start([email]),
+                        on_deferred=journal.retry_later
+                    )
+                    healthy = [i for i, relay in enumerate(scheduler.relays) if relay.error is None]
+            finally:
+                # Outcomes are already journaled; hand the never-started rest of the batch back.
+                # Sends lost mid-flight stay 'sending' and become 'unknown' on the next run.
+                journal.release([c['email'] for c in batch])
+                if in_doubt:
+                    logger.warning(f"{len(in_doubt)} sends were lost with their worker; not retried.")
+                sent_log.flush()
+                try:
+                    database.record_send_results(results, {c['email']: c for c in batch})
+                except Exception as e:
+                    logger.warning(f"Could not update send analytics: {e}")
+
+    if not healthy:
+        logger.error("Stopped early: every relay refused our login, sender or connection. Check the relay settings.")
+    if count >= max_daily:
+        logger.info("Daily limit reached.")
+    logger.info(f"Sent {count} emails this run. Journal: {journal.counts()}")
+    journal.close()
+    if work_queue is not None:
+        work_queue.close()
 
 if __name__ == "__main__":
-    import datetime
     main()
@@ -2,81 +2,162 @@ import sys
 import os
 import json
 import logging
-import glob
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data/logs")
-os.makedirs(log_dir, exist_ok=True)
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(log_dir, "bbrc_agent.log"), mode='a', encoding='utf-8'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+from utils import run_catalog
+from utils.streaming import iter_json_array, JsonArrayWriter
+from utils.campaign import CURRENT as CAMPAIGN
+from utils.logging_setup import setup_logging, set_run_id
+from utils.work_queue import queue_from_config, new_group, run_group, DONE
+
+setup_logging("profiling")
 logger = logging.getLogger("ProfilingAgent")
 
-def load_papers():
+OUTPUT_FILE = CAMPAIGN.path("authors/profiles_latest.json")
+
+def load_config():
+    return CAMPAIGN.load_config()
+
+def latest_papers_file():
     # Find the most recent papers file
-    list_of_files = glob.glob('data/raw_papers/*.json')
-    if not list_of_files:
-        logger.warning("No paper files found in data/raw_papers/")
-        return []
+    latest_file = run_catalog.latest_artifact("discovery")
+    if not latest_file:
+        logger.warning(f"No paper files found in {run_catalog.RAW_PAPERS_DIR}")
+        return None
     
-    latest_file = max(list_of_files, key=os.path.getctime)
+    if run_catalog.latest_run("discovery")['status'] == 'incomplete':
+        logger.warning("Latest discovery run is incomplete; profiling the keywords it finished")
     logger.info(f"Processing latest file: {latest_file}")
+    return latest_file
+
+def load_papers():
+    latest_file = latest_papers_file()
+    if not latest_file:
+        return []
     
     with open(latest_file, 'r') as f:
         return json.load(f)
 
+def iter_profiles(paper):
+    """Yields one author profile per named author of a paper."""
+    paper_authors = paper.get('authors', [])
+    for position, author in enumerate(paper_authors, start=1):
+        # Basic normalization
+        first = author.get('first_name', '').strip()
+        last = author.get('last_name', '').strip()
+        
+        if not last:
+            continue
+            
+        full_name = f"{first} {last}".strip()
+        
+        # Create author profile
+        yield {
+            'name': full_name,
+            'first_name': first,
+            'last_name': last,
+            'affiliations': author.get('affiliation', []),
+            'paper_title': paper.get('title'),
+            'paper_id': paper.get('id'),
+            'journal': paper.get('journal'),
+            'pub_date': paper.get('pub_date'),
+            'author_position': position,
+            'author_count': len(paper_authors),
+            'emails': [] # To be filled by Email Discovery Agent
+        }
+
 def extract_authors(papers):
     authors_data = []
     
     for paper in papers:
-        for author in paper.get('authors', []):
-            # Basic normalization
-            first = author.get('first_name', '').strip()
-            last = author.get('last_name', '').strip()
-            
-            if not last:
-                continue
-                
-            full_name = f"{first} {last}".strip()
-            
-            # Create author profile
-            profile = {
-                'name': full_name,
-                'first_name': first,
-                'last_name': last,
-                'affiliations': author.get('affiliation', []),
-                'paper_title': paper.get('title'),
-                'paper_id': paper.get('id'),
-                'journal': paper.get('journal'),
-                'emails': [] # To be filled by Email Discovery Agent
-            }
-            authors_data.append(profile)
+        authors_data.extend(iter_profiles(paper))
             
     return authors_data
 
+EXTRACT_TASK = "profiling.extract"
+
+def extract_task(payload, campaign):
+    """Worker side of a queued profiling chunk."""
+    return extract_authors(payload['papers'])
+
+def extract_authors_queued(work_queue, papers, chunk_size=500, poll_interval=1.0):
+    """
+    extract_authors with the papers split into chunks that workers process.
+    Profiles come back in paper order.
+    """
+    group = new_group("profiling")
+    work_queue.enqueue(group, EXTRACT_TASK, [
+        {'papers': papers[start:start + chunk_size]} for start in range(0, len(papers), chunk_size)
+    ], campaign=CAMPAIGN.name)
+    try:
+        tasks = run_group(work_queue, group, {EXTRACT_TASK: extract_task}, poll_interval=poll_interval)
+    finally:
+        work_queue.purge(group)
+
+    failed = [task for task in tasks if task.state != DONE]
+    if failed:
+        raise RuntimeError(f"{len(failed)} profiling chunks failed, last error: {failed[-1].error}")
+    return [profile for task in tasks for profile in task.result]
+
+def stream_profiles(papers_file, output_file):
+    """
+    Reads papers one at a time and writes profiles as they are produced, so
+    memory stays flat regardless of input size. Writes the same profiles as
+    extract_authors. Returns the number of profiles written.
+    """
+    with JsonArrayWriter(output_file) as writer:
+        for paper in iter_json_array(papers_file):
+            for profile in iter_profiles(paper):
+                writer.write(profile)
+    return writer.count
+
 def main():
     logger.info("Starting Author Profiling Agent...")
+
+    config = load_config()
+    if config.get('profiling', {}).get('streaming', False):
+        papers_file = latest_papers_file()
+        if not papers_file:
+            return
+
+        run_id = run_catalog.start_run("profiling")
+        set_run_id(run_id)
+        count = stream_profiles(papers_file, OUTPUT_FILE)
+        logger.info(f"Saved {count} author profiles to {OUTPUT_FILE}")
+        run_catalog.finish_run(run_id, artifact_path=OUTPUT_FILE, record_count=count)
+        return
     
     papers = load_papers()
     if not papers:
         return
 
-    authors = extract_authors(papers)
+    run_id = run_catalog.start_run("profiling")
+    set_run_id(run_id)
+
+    work_queue = queue_from_config(config)
+    if work_queue is not None:
+        queue_config = config['queue']
+        try:
+            authors = extract_authors_queued(
+                work_queue, papers,
+                chunk_size=queue_config.get('profiling_chunk', 500),
+                poll_interval=queue_config.get('poll_interval', 1.0)
+            )
+        finally:
+            work_queue.close()
+    else:
+        authors = extract_authors(papers)
     logger.info(f"Extracted {len(authors)} author profiles")
     
     # Save to authors directory
-    output_file = "data/authors/profiles_latest.json"
+    output_file = OUTPUT_FILE
     with open(output_file, 'w') as f:
         json.dump(authors, f, indent=2)
         
     logger.info(f"Saved profiles to {output_file}")
+    run_catalog.finish_run(run_id, artifact_path=output_file, record_count=len(authors))
 
 if __name__ == "__main__":
     main()
@@ -8,22 +8,22 @@ import dns.resolver
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data/logs")
-os.makedirs(log_dir, exist_ok=True)
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(log_dir, "bbrc_agent.log"), mode='a', encoding='utf-8'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+from utils.mailbox_verifier import MailboxVerifier, INVALID
+from utils.campaign import CURRENT as CAMPAIGN, SHARED_DATA_DIR
+from utils.logging_setup import setup_logging
+from utils.work_queue import queue_from_config, new_group, run_group, DONE
+
+setup_logging("validation")
 logger = logging.getLogger("ValidationAgent")
 
-HISTORY_FILE = "data/logs/history.csv"
+# Suppression history is shared by all campaigns
+HISTORY_FILE = os.path.join(SHARED_DATA_DIR, "logs/history.csv")
+
+def load_config():
+    return CAMPAIGN.load_config()
 
 def load_candidates():
-    input_file = "data/authors/profiles_with_emails.json"
+    input_file = CAMPAIGN.path("authors/profiles_with_emails.json")
     if not os.path.exists(input_file):
         return []
     with open(input_file, 'r') as f:
@@ -50,6 +50,8 @@ def validate_domain(email):
 
 def validate_and_dedup(candidates, history):
     validated_list = []
+    # Logged once at the end: a line per hit dominated runs with a large history
+    skipped = 0
     
     for candidate in candidates:
         valid_emails = []
@@ -62,7 +64,7 @@ def validate_and_dedup(candidates, history):
                 
             # Deduplication
             if email in history:
-                logger.info(f"Skipping {email} - already in history")
+                skipped += 1
                 continue
                 
             # Domain validation (Optional: enable for strict mode)
@@ -79,12 +81,86 @@ def validate_and_dedup(candidates, history):
                 'first_name': candidate.get('first_name', ''),
                 'email': valid_emails[0], # Pick first valid for now
                 'paper_title': candidate.get('paper_title', ''),
-                'journal': candidate.get('journal', '')
+                'journal': candidate.get('journal', ''),
+                'paper_id': candidate.get('paper_id'),
+                'pub_date': candidate.get('pub_date'),
+                'author_position': candidate.get('author_position'),
+                'author_count': candidate.get('author_count')
             }
             validated_list.append(clean_record)
             
+    if skipped:
+        logger.info(f"Skipped {skipped} emails already in history")
     return validated_list
 
+VERIFY_TASK = "validation.verify"
+
+def verify_task(payload, campaign):
+    """Worker side of a queued domain group: probe its mailboxes."""
+    verifier = MailboxVerifier.from_config(campaign.load_config().get('validation', {}))
+    try:
+        return verifier.verify(payload['emails'])
+    finally:
+        verifier.close()
+
+def verify_queued(work_queue, emails, chunk_size=50, poll_interval=1.0):
+    """
+    Mailbox statuses with the addresses grouped by domain into queue tasks,
+    so different workers probe different mail servers. Addresses whose task
+    failed are left out (deep_verify keeps them).
+    """
+    by_domain = {}
+    for email in emails:
+        by_domain.setdefault(email.rsplit('@', 1)[-1], []).append(email)
+
+    group = new_group("validation")
+    work_queue.enqueue(group, VERIFY_TASK, [
+        {'domain': domain, 'emails': members[start:start + chunk_size]}
+        for domain, members in by_domain.items()
+        for start in range(0, len(members), chunk_size)
+    ], campaign=CAMPAIGN.name)
+    try:
+        tasks = run_group(work_queue, group, {VERIFY_TASK: verify_task}, poll_interval=poll_interval)
+    finally:
+        work_queue.purge(group)
+
+    statuses = {}
+    for task in tasks:
+        if task.state == DONE:
+            statuses.update(task.result)
+        else:
+            logger.warning(f"Could not verify {len(task.payload['emails'])} addresses at {task.payload['domain']}: {task.error}")
+    return statuses
+
+def deep_verify(validated_list, validation_config, work_queue=None, queue_config=None):
+    """
+    Drops records whose mailbox the recipient's mail server rejects.
+    Catch-all and unverifiable addresses are kept.
+    """
+    emails = [record['email'] for record in validated_list]
+    if work_queue is not None:
+        queue_config = queue_config or {}
+        statuses = verify_queued(
+            work_queue, emails,
+            chunk_size=queue_config.get('verify_chunk', 50),
+            poll_interval=queue_config.get('poll_interval', 1.0)
+        )
+    else:
+        verifier = MailboxVerifier.from_config(validation_config)
+        try:
+            statuses = verifier.verify(emails)
+        finally:
+            verifier.close()
+
+    kept = []
+    for record in validated_list:
+        record['mailbox_status'] = statuses.get(record['email'])
+        if record['mailbox_status'] == INVALID:
+            logger.info(f"Dropping {record['email']} - mailbox rejected by server")
+            continue
+        kept.append(record)
+    return kept
+
 def main():
     logger.info("Starting Validation Agent...")
     
@@ -93,10 +169,18 @@ def main():
     
     logger.info(f"Loaded {len(candidates)} candidates and {len(history)} history records.")
     
+    config = load_config()
+    validation_config = config.get('validation', {})
     final_list = validate_and_dedup(candidates, history)
+    if validation_config.get('deep_verify', False):
+        work_queue = queue_from_config(config)
+        try:
+            final_list = deep_verify(final_list, validation_config, work_queue, config.get('queue'))
+        finally:
+            if work_queue is not None:
+                work_queue.close()
     
-    output_file = "data/validated_list/ready_to_send.json"
-    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    output_file = CAMPAIGN.path("validated_list/ready_to_send.json")
     with open(output_file, 'w') as f:
         json.dump(final_list, f, indent=2)
         
@@ -0,0 +1,139 @@
+"""
+Response encoding for the API: compact JSON (orjson when installed),
+gzip/deflate negotiated from Accept-Encoding, and streamed list responses.
+"""
+import json
+import zlib
+import logging
+
+from flask import Response, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Bodies smaller than this are not worth the compression CPU
+MIN_COMPRESS_SIZE = 1024
+COMPRESS_LEVEL = 6
+COMPRESSIBLE_TYPES = ('application/json', 'text/')
+# zlib wbits for each content coding
+WBITS = {'gzip': 31, 'deflate': 15}
+
+logger = logging.getLogger(__name__)
+
+def dumps(obj):
+    """Compact JSON as bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+class CompactJSONProvider(DefaultJSONProvider):
+    """Makes jsonify use the fast, unindented encoder."""
+    compact = True
+    sort_keys = False
+    ensure_ascii = False
+
+    def dumps(self, obj, **kwargs):
+        # Flask passes compact separators itself; anything else (indent etc.) needs the stdlib
+        if orjson is not None and set(kwargs) <= {'separators'}:
+            try:
+                return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+            except TypeError:
+                pass
+        kwargs.setdefault('separators', (',', ':'))
+        return super().dumps(obj, **kwargs)
+
+def negotiate_encoding():
+    """Best of gzip/deflate the client accepts, or None."""
+    accepted = request.accept_encodings
+    best, best_q = None, 0
+    for coding in ('gzip', 'deflate'):
+        q = accepted.quality(coding)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+def _compressor(coding):
+    return zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, WBITS[coding])
+
+def compress_response(response):
+    """
+    after_request hook: compresses buffered responses above MIN_COMPRESS_SIZE
+    when the client accepts it. Streamed responses compress themselves.
+    """
+    response.vary.add('Accept-Encoding')
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or not response.mimetype.startswith(COMPRESSIBLE_TYPES)):
+        return response
+
+    body = response.get_data()
+    if len(body) < MIN_COMPRESS_SIZE:
+        return response
+    coding = negotiate_encoding()
+    if coding is None:
+        return response
+
+    compressor = _compressor(coding)
+    response.set_data(compressor.compress(body) + compressor.flush())
+    response.headers['Content-Encoding'] = coding
+    return response
+
+def stream_json_list(items, wrap=None, chunk_size=256 * 1024):
+    """
+    Streams a JSON array of items (any iterable, e.g. a database cursor
+    generator) without building the whole body in memory. With wrap='key' the
+    array is returned as {"key": [...]}. Compressed on the fly when the
+    client accepts it.
+
+    The status line is sent before items are read, so an error part-way is
+    logged and the array closed, leaving the body valid JSON; with wrap the
+    object also gets an "error" member so clients can tell it is incomplete.
+    """
+    head, tail = b'[', b']'
+    if wrap:
+        head, tail = b'{' + dumps(wrap) + b':[', b']}'
+    coding = negotiate_encoding()
+
+    def chunks():
+        buffer = bytearray(head)
+        first = True
+        closing = tail
+        try:
+            for item in items:
+                encoded = dumps(item)
+                if not first:
+                    buffer += b','
+                buffer += encoded
+                first = False
+                if len(buffer) >= chunk_size:
+                    yield bytes(buffer)
+                    buffer.clear()
+        except Exception as e:
+            logger.exception(f"Streamed response ended early after an error: {e}")
+            if wrap:
+                closing = b'],"error":' + dumps(str(e)) + b'}'
+        buffer += closing
+        yield bytes(buffer)
+
+    def compressed():
+        compressor = _compressor(coding)
+        for chunk in chunks():
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+
+    response = Response(compressed() if coding else chunks(), mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    if coding:
+        response.headers['Content-Encoding'] = coding
+    return response
+
+def init_app(app):
+    app.json_provider_class = CompactJSONProvider
+    app.json = CompactJSONProvider(app)
+    app.after_request(compress_response)
@@ -7,21 +7,27 @@ import threading
 from flask import Flask, jsonify, request, Response
 import flask
 from flask_cors import CORS
-import glob
 
 # Add parent directory to path to allow importing agents if needed
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # Add current directory to path to allow importing local modules (database.py) when running from root
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from utils import run_catalog
+from utils.logging_setup import format_line
+from utils.campaign import CURRENT as CAMPAIGN, SHARED_DATA_DIR, Campaign, ENV_VAR as CAMPAIGN_ENV_VAR
+import api_responses
+
 app = Flask(__name__)
 CORS(app) # Enable CORS for all routes
+api_responses.init_app(app) # Compact JSON, gzip/deflate
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-CONFIG_PATH = os.path.join(BASE_DIR, "../config/settings.yaml")
-KEYWORDS_PATH = os.path.join(BASE_DIR, "../config/keywords.json")
-TEMPLATE_PATH = os.path.join(BASE_DIR, "../config/templates/cfp_email.txt")
-LOG_DIR = os.path.join(BASE_DIR, "../data/logs")
+# The API serves the campaign selected by BBRC_CAMPAIGN (default: config/ and data/)
+CONFIG_PATH = CAMPAIGN.config_path
+KEYWORDS_PATH = CAMPAIGN.own_file("keywords.json")
+TEMPLATE_PATH = CAMPAIGN.own_file("templates/cfp_email.txt")
+LOG_DIR = os.path.join(SHARED_DATA_DIR, "logs")
 
 def load_yaml(path):
     if os.path.exists(path):
@@ -33,8 +39,8 @@ def save_yaml(path, data):
     with open(path, 'w') as f:
         yaml.dump(data, f)
 
-def run_agent_script(agent_name):
-    """Runs an agent script in a separate thread/process"""
+def run_agent_script(agent_name, campaign=None):
+    """Runs an agent script in a separate thread/process, optionally for another campaign"""
     script_map = {
         "discovery": "agents/discovery_agent.py",
         "profiling": "agents/profiling_agent.py",
@@ -51,7 +57,10 @@ def run_agent_script(agent_name):
     full_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), script_path)
     
     def run():
-        subprocess.run([sys.executable, full_path], check=False)
+        env = dict(os.environ)
+        if campaign:
+            env[CAMPAIGN_ENV_VAR] = campaign
+        subprocess.run([sys.executable, full_path], check=False, env=env)
         
     thread = threading.Thread(target=run)
     thread.start()
@@ -73,20 +82,25 @@ def get_stats():
     # Simple counting logic (similar to logging agent)
     try:
         # Papers
-        paper_files = glob.glob(os.path.join(BASE_DIR, "../data/raw_papers", "*.json"))
-        if paper_files:
-            latest = max(paper_files, key=os.path.getctime)
-            with open(latest, 'r') as f:
-                stats['papers_found'] = len(json.load(f))
+        latest_papers = run_catalog.latest_run("discovery")
+        if latest_papers:
+            if latest_papers['record_count'] is not None:
+                stats['papers_found'] = latest_papers['record_count']
+            elif latest_papers['artifact_path'] and os.path.exists(latest_papers['artifact_path']):
+                with open(latest_papers['artifact_path'], 'r') as f:
+                    stats['papers_found'] = len(json.load(f))
         
         # Authors
-        authors_path = os.path.join(BASE_DIR, "../data/authors/profiles_latest.json")
-        if os.path.exists(authors_path):
+        latest_profiles = run_catalog.latest_run("profiling")
+        authors_path = CAMPAIGN.path("authors/profiles_latest.json")
+        if latest_profiles and latest_profiles['record_count'] is not None:
+            stats['authors_profiled'] = latest_profiles['record_count']
+        elif os.path.exists(authors_path):
              with open(authors_path, 'r') as f:
                 stats['authors_profiled'] = len(json.load(f))
 
         # Emails Sent
-        sent_path = os.path.join(BASE_DIR, "../data/logs/sent_emails.csv")
+        sent_path = CAMPAIGN.path("logs/sent_emails.csv")
         if os.path.exists(sent_path):
             with open(sent_path, 'r') as f:
                 stats['emails_sent'] = sum(1 for line in f)
@@ -98,13 +112,12 @@ def get_stats():
 
 @app.route('/api/config', methods=['GET'])
 def get_config():
-    config = load_yaml(CONFIG_PATH)
+    config = CAMPAIGN.load_config()
     if 'discovery' not in config:
         config['discovery'] = {}
         
-    if os.path.exists(KEYWORDS_PATH):
-        with open(KEYWORDS_PATH, 'r') as f:
-            config['discovery']['keywords'] = json.load(f)
+    if os.path.exists(CAMPAIGN.keywords_path):
+        config['discovery']['keywords'] = CAMPAIGN.load_keywords()
     return jsonify(config)
 
 @app.route('/api/config', methods=['POST'])
@@ -140,10 +153,8 @@ def update_config():
 @app.route('/api/template', methods=['GET'])
 def get_template():
     try:
-        if os.path.exists(TEMPLATE_PATH):
-            with open(TEMPLATE_PATH, 'r', encoding='utf-8') as f:
-                content = f.read()
-            return jsonify({"template": content})
+        if os.path.exists(CAMPAIGN.template_path):
+            return jsonify({"template": CAMPAIGN.load_template()})
         return jsonify({"template": ""}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -163,7 +174,11 @@ def update_template():
 
 @app.route('/api/agents/<name>/start', methods=['POST'])
 def start_agent(name):
-    success, msg = run_agent_script(name)
+    campaign = request.args.get('campaign') or None
+    # Only existing workspaces: the agent would otherwise create campaigns/<name>/ on first write
+    if campaign and campaign not in Campaign.list_names():
+        return jsonify({"status": "error", "message": f"Unknown campaign: {campaign}"}), 404
+    success, msg = run_agent_script(name, campaign)
     if success:
         return jsonify({"status": "started", "message": msg})
     return jsonify({"status": "error", "message": msg}), 400
@@ -176,7 +191,7 @@ database.init_db()
 @app.route('/api/authors/sync', methods=['POST'])
 def sync_authors():
     try:
-        profiles_path = os.path.join(BASE_DIR, "../data/authors/profiles_with_emails.json")
+        profiles_path = CAMPAIGN.path("authors/profiles_with_emails.json")
         if os.path.exists(profiles_path):
             with open(profiles_path, 'r') as f:
                 profiles = json.load(f)
@@ -192,8 +207,41 @@ def sync_authors():
 @app.route('/api/authors', methods=['GET'])
 def get_authors():
     try:
-        authors = database.get_all_authors()
-        return jsonify(authors)
+        return api_responses.stream_json_list(database.iter_all_authors())
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route('/api/authors/search', methods=['GET'])
+def search_authors():
+    query = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 50, type=int), 1), 200)
+    try:
+        results, total = database.search_authors(query, page=page, per_page=per_page)
+        return jsonify({
+            "query": query,
+            "page": page,
+            "per_page": per_page,
+            "total": total,
+            "results": results
+        })
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+ANALYTICS_ROUTES = {"journals": "journal", "countries": "country", "domains": "domain"}
+
+@app.route('/api/analytics/<breakdown>', methods=['GET'])
+def get_analytics(breakdown):
+    dimension = ANALYTICS_ROUTES.get(breakdown)
+    if dimension is None:
+        return jsonify({"status": "error", "message": f"Unknown breakdown: {breakdown}"}), 404
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 1000)
+    order_by = request.args.get('order', 'authors')
+    try:
+        groups, totals = database.get_analytics(dimension, limit=limit, order_by=order_by)
+        return jsonify({"dimension": dimension, "totals": totals, "groups": groups})
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
@@ -219,7 +267,8 @@ def get_logs():
         with open(log_file, 'r') as f:
             # Read last 100 lines
             lines = f.readlines()[-100:]
-            return jsonify({"logs": [l.strip() for l in lines]})
+            # Agents write JSON lines; show them in the familiar text format
+            return jsonify({"logs": [format_line(l) for l in lines]})
     except Exception as e:
         return jsonify({"items": [], "error": str(e)}), 500
 
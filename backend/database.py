@@ -1,12 +1,36 @@
 import sqlite3
 import os
 import json
+import re
 
-DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data/authors.db")
+from utils.campaign import DATA_DIR
+
+DB_PATH = os.environ.get('BBRC_DB_PATH', os.path.join(DATA_DIR, "authors.db"))
+
+# Bumped whenever init_db needs to run a data migration (stored in PRAGMA user_version)
+SCHEMA_VERSION = 4
+
+# Dimensions kept in analytics_counts, keyed by the authors column they come from
+ANALYTICS_DIMENSIONS = {'journal': 'journal', 'country': 'country', 'domain': 'email_domain'}
+UNKNOWN_GROUP = '(unknown)'
+
+COUNTRY_ALIASES = {
+    'usa': 'United States', 'u.s.a': 'United States', 'us': 'United States',
+    'united states of america': 'United States', 'united states': 'United States',
+    'uk': 'United Kingdom', 'u.k': 'United Kingdom', 'england': 'United Kingdom',
+    'scotland': 'United Kingdom', 'wales': 'United Kingdom',
+    "people's republic of china": 'China', 'pr china': 'China', 'p.r. china': 'China',
+    'republic of korea': 'South Korea', 'korea': 'South Korea',
+}
 
 def get_db_connection():
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
+    # add_author upserts with ON CONFLICT(email) DO UPDATE, which fires the
+    # update triggers. A REPLACE-style write to authors instead deletes the
+    # old row, and only fires the delete triggers (which keep authors_fts and
+    # the analytics counts in sync) when recursive triggers are enabled.
+    conn.execute('PRAGMA recursive_triggers = ON')
     return conn
 
 def init_db():
@@ -25,9 +49,300 @@ def init_db():
             UNIQUE(email)
         )
     ''')
+
+    # Full-text index over the searchable author fields, backed by the authors table
+    fts_exists = c.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'authors_fts'"
+    ).fetchone()
+    c.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS authors_fts USING fts5(
+            name, affiliations, paper_title,
+            content='authors', content_rowid='id',
+            prefix='2 3'
+        )
+    ''')
+    c.executescript('''
+        CREATE TRIGGER IF NOT EXISTS authors_fts_ai AFTER INSERT ON authors BEGIN
+            INSERT INTO authors_fts(rowid, name, affiliations, paper_title)
+            VALUES (new.id, new.name, new.affiliations, new.paper_title);
+        END;
+        CREATE TRIGGER IF NOT EXISTS authors_fts_ad AFTER DELETE ON authors BEGIN
+            INSERT INTO authors_fts(authors_fts, rowid, name, affiliations, paper_title)
+            VALUES ('delete', old.id, old.name, old.affiliations, old.paper_title);
+        END;
+        CREATE TRIGGER IF NOT EXISTS authors_fts_au AFTER UPDATE ON authors BEGIN
+            INSERT INTO authors_fts(authors_fts, rowid, name, affiliations, paper_title)
+            VALUES ('delete', old.id, old.name, old.affiliations, old.paper_title);
+            INSERT INTO authors_fts(rowid, name, affiliations, paper_title)
+            VALUES (new.id, new.name, new.affiliations, new.paper_title);
+        END;
+    ''')
+    if not fts_exists:
+        # Index rows that were added before the FTS table existed
+        c.execute("INSERT INTO authors_fts(authors_fts) VALUES ('rebuild')")
+
+    # Normalized schema: one row per paper, researcher and email, linked by authorships.
+    # The flat authors table above stays as the contact list served by the API.
+    c.executescript('''
+        CREATE TABLE IF NOT EXISTS papers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pmid TEXT UNIQUE,
+            doi TEXT,
+            title TEXT,
+            journal TEXT,
+            pub_date TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS researchers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            first_name TEXT,
+            last_name TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS authorships (
+            researcher_id INTEGER NOT NULL REFERENCES researchers(id),
+            paper_id INTEGER NOT NULL REFERENCES papers(id),
+            position INTEGER,
+            affiliation TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (researcher_id, paper_id)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS emails (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT NOT NULL UNIQUE,
+            domain TEXT NOT NULL,
+            researcher_id INTEGER NOT NULL REFERENCES researchers(id),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_papers_doi ON papers(doi);
+        CREATE INDEX IF NOT EXISTS idx_papers_journal_created ON papers(journal, created_at);
+        CREATE INDEX IF NOT EXISTS idx_papers_created ON papers(created_at);
+        CREATE INDEX IF NOT EXISTS idx_authorships_paper ON authorships(paper_id);
+        CREATE INDEX IF NOT EXISTS idx_authorships_created ON authorships(created_at);
+        CREATE INDEX IF NOT EXISTS idx_emails_domain ON emails(domain);
+        CREATE INDEX IF NOT EXISTS idx_emails_researcher ON emails(researcher_id);
+        CREATE INDEX IF NOT EXISTS idx_researchers_created ON researchers(created_at);
+        CREATE INDEX IF NOT EXISTS idx_authors_created ON authors(created_at);
+    ''')
+
+    # Grouping columns for analytics, derived once per row on write
+    columns = {row[1] for row in c.execute('PRAGMA table_info(authors)')}
+    for column in ('country', 'email_domain'):
+        if column not in columns:
+            c.execute('ALTER TABLE authors ADD COLUMN {} TEXT'.format(column))
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS analytics_counts (
+            dimension TEXT NOT NULL,
+            value TEXT NOT NULL,
+            authors INTEGER NOT NULL DEFAULT 0,
+            sent INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, value)
+        ) WITHOUT ROWID
+    ''')
+    # Latest outcome per recipient, so retries are not counted twice
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS send_outcomes (
+            email TEXT PRIMARY KEY,
+            success INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+
+    version = c.execute('PRAGMA user_version').fetchone()[0]
+    if version < 2:
+        migrate_flat_authors(conn)
+    if version < 4:
+        # 4: country parsing no longer keeps 'Electronic address:' and trailing sentences
+        backfill_analytics(conn)
+    if version < SCHEMA_VERSION:
+        c.execute('PRAGMA user_version = {}'.format(SCHEMA_VERSION))
+
+    # Created after the backfill so existing rows are not counted twice
+    c.executescript(_analytics_triggers())
+
     conn.commit()
     conn.close()
 
+def migrate_flat_authors(conn):
+    """
+    Backfills the normalized tables from the flat authors table.
+    Safe to re-run: every insert is idempotent.
+    """
+    rows = conn.execute(
+        'SELECT name, email, affiliations, paper_title, paper_id, journal, created_at FROM authors'
+    ).fetchall()
+    for row in rows:
+        try:
+            affiliations = json.loads(row['affiliations'] or '[]')
+        except ValueError:
+            affiliations = [row['affiliations']]
+        _record_authorship(conn, {
+            'name': row['name'],
+            'affiliations': affiliations,
+            'paper_title': row['paper_title'],
+            'paper_id': row['paper_id'],
+            'journal': row['journal'],
+        }, [row['email']], created_at=row['created_at'])
+
+def _country_name(text):
+    """
+    Normalizes the last comma-separated part of an affiliation to a country
+    name, or returns None when it does not look like one.
+    """
+    # 'USA. Department of ...' -> 'USA', but 'P.R. China' and 'U.S.A.' stay whole
+    country = re.split(r'(?<=[^.\s]{2})\.\s', text.strip(), maxsplit=1)[0].strip().rstrip('.;:, ')
+    # 'Canada N1G 2W1' -> 'Canada'
+    country = re.sub(r'\s+\S*\d.*$', '', country).strip()
+    if not country or any(ch.isdigit() for ch in country):
+        return None
+    return COUNTRY_ALIASES.get(country.lower(), country)
+
+def affiliation_country(affiliations):
+    """
+    Best-effort country of the first affiliation: PubMed affiliations usually
+    end in '..., City, Country.', sometimes followed by an email address.
+    """
+    if isinstance(affiliations, str):
+        affiliations = [affiliations]
+    for affiliation in affiliations or []:
+        text = re.sub(r'\S+@\S+', '', affiliation or '')
+        text = re.sub(r'Electronic address:', '', text, flags=re.IGNORECASE).strip().rstrip('.;:, ')
+        if ',' not in text:
+            continue
+        country = _country_name(text.rsplit(',', 1)[1])
+        if country:
+            return country
+    return None
+
+def _group_sql(column):
+    return "COALESCE(NULLIF(TRIM({}), ''), '{}')".format(column, UNKNOWN_GROUP)
+
+def _analytics_triggers():
+    """
+    Triggers that keep analytics_counts.authors in step with the authors table.
+    """
+    def bump(row, delta):
+        return ''.join(
+            "INSERT INTO analytics_counts (dimension, value, authors) VALUES ('{}', {}, {}) "
+            "ON CONFLICT(dimension, value) DO UPDATE SET authors = authors + {};\n".format(
+                dimension, _group_sql('{}.{}'.format(row, column)), delta, delta)
+            for dimension, column in ANALYTICS_DIMENSIONS.items()
+        )
+
+    return '''
+        CREATE TRIGGER IF NOT EXISTS authors_analytics_ai AFTER INSERT ON authors BEGIN
+            {insert_new}
+        END;
+        CREATE TRIGGER IF NOT EXISTS authors_analytics_ad AFTER DELETE ON authors BEGIN
+            {remove_old}
+        END;
+        CREATE TRIGGER IF NOT EXISTS authors_analytics_au
+        AFTER UPDATE OF journal, country, email_domain ON authors BEGIN
+            {remove_old}
+            {insert_new}
+        END;
+    '''.format(insert_new=bump('new', 1), remove_old=bump('old', -1))
+
+def backfill_analytics(conn):
+    """
+    Fills the grouping columns of existing authors and rebuilds the author
+    counts from scratch. Send counts are kept, moved to the re-normalized
+    country where its name changed.
+    """
+    rows = conn.execute('SELECT id, email, affiliations FROM authors').fetchall()
+    updates = []
+    for row in rows:
+        try:
+            affiliations = json.loads(row['affiliations'] or '[]')
+        except ValueError:
+            affiliations = [row['affiliations']]
+        domain = (row['email'] or '').lower().rpartition('@')[2]
+        updates.append((affiliation_country(affiliations), domain or None, row['id']))
+    conn.executemany('UPDATE authors SET country = ?, email_domain = ? WHERE id = ?', updates)
+
+    stale = conn.execute(
+        "SELECT value, sent, failed FROM analytics_counts WHERE dimension = 'country' AND value != ?",
+        (UNKNOWN_GROUP,)
+    ).fetchall()
+    for row in stale:
+        value = _country_name(row['value']) or UNKNOWN_GROUP
+        if value == row['value']:
+            continue
+        conn.execute("DELETE FROM analytics_counts WHERE dimension = 'country' AND value = ?", (row['value'],))
+        conn.execute('''
+            INSERT INTO analytics_counts (dimension, value, sent, failed) VALUES ('country', ?, ?, ?)
+            ON CONFLICT(dimension, value) DO UPDATE SET
+                sent = sent + excluded.sent,
+                failed = failed + excluded.failed
+        ''', (value, row['sent'], row['failed']))
+
+    conn.execute('UPDATE analytics_counts SET authors = 0')
+    for dimension, column in ANALYTICS_DIMENSIONS.items():
+        # 'WHERE true' keeps SQLite from parsing ON CONFLICT as part of the SELECT
+        conn.execute('''
+            INSERT INTO analytics_counts (dimension, value, authors)
+            SELECT ?, {group}, COUNT(*) FROM authors WHERE true GROUP BY {group}
+            ON CONFLICT(dimension, value) DO UPDATE SET authors = excluded.authors
+        '''.format(group=_group_sql(column)), (dimension,))
+
+def _record_authorship(conn, author_data, emails, created_at=None):
+    """
+    Writes one profile into papers/researchers/authorships/emails.
+    The researcher is matched on any already-known email address.
+    """
+    emails = [e.lower().strip() for e in emails if e and '@' in e]
+    if not emails:
+        return
+
+    placeholders = ','.join('?' * len(emails))
+    existing = conn.execute(
+        'SELECT researcher_id FROM emails WHERE email IN ({}) LIMIT 1'.format(placeholders), emails
+    ).fetchone()
+    if existing:
+        researcher_id = existing[0]
+    else:
+        researcher_id = conn.execute(
+            'INSERT INTO researchers (name, first_name, last_name, created_at) '
+            'VALUES (?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))',
+            (author_data.get('name'), author_data.get('first_name'), author_data.get('last_name'), created_at)
+        ).lastrowid
+
+    for email in emails:
+        conn.execute(
+            'INSERT OR IGNORE INTO emails (email, domain, researcher_id, created_at) '
+            'VALUES (?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))',
+            (email, email.rsplit('@', 1)[1], researcher_id, created_at)
+        )
+
+    pmid = author_data.get('paper_id')
+    if not pmid:
+        return
+    conn.execute('''
+        INSERT INTO papers (pmid, doi, title, journal, pub_date, created_at)
+        VALUES (?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+        ON CONFLICT(pmid) DO UPDATE SET
+            doi = COALESCE(excluded.doi, doi),
+            title = COALESCE(excluded.title, title),
+            journal = COALESCE(excluded.journal, journal),
+            pub_date = COALESCE(excluded.pub_date, pub_date)
+    ''', (
+        str(pmid),
+        author_data.get('doi') or None,
+        author_data.get('paper_title'),
+        author_data.get('journal'),
+        author_data.get('pub_date'),
+        created_at
+    ))
+    paper_id = conn.execute('SELECT id FROM papers WHERE pmid = ?', (str(pmid),)).fetchone()[0]
+    conn.execute(
+        'INSERT OR IGNORE INTO authorships (researcher_id, paper_id, position, affiliation, created_at) '
+        'VALUES (?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))',
+        (researcher_id, paper_id, author_data.get('author_position'),
+         '\n'.join(author_data.get('affiliations') or []), created_at)
+    )
+
 def add_author(author_data):
     """
     Upserts an author into the database.
@@ -50,17 +365,30 @@ def add_author(author_data):
     affiliations = json.dumps(author_data.get('affiliations', []))
     
     try:
+        # Upsert keeps the row id stable; earlier papers survive in the authorships table
         c.execute('''
-            INSERT OR REPLACE INTO authors (name, email, affiliations, paper_title, paper_id, journal)
-            VALUES (?, ?, ?, ?, ?, ?)
+            INSERT INTO authors (name, email, affiliations, paper_title, paper_id, journal, country, email_domain)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(email) DO UPDATE SET
+                name = excluded.name,
+                affiliations = excluded.affiliations,
+                paper_title = excluded.paper_title,
+                paper_id = excluded.paper_id,
+                journal = excluded.journal,
+                country = excluded.country,
+                email_domain = excluded.email_domain
         ''', (
             author_data.get('name'),
             email,
             affiliations,
             author_data.get('paper_title'),
             author_data.get('paper_id'),
-            author_data.get('journal')
+            author_data.get('journal'),
+            affiliation_country(author_data.get('affiliations')),
+            email.lower().rpartition('@')[2] or None
         ))
+        emails = author_data['emails'] if isinstance(author_data['emails'], list) else [email]
+        _record_authorship(conn, author_data, emails)
         conn.commit()
         return True
     except sqlite3.IntegrityError:
@@ -76,6 +404,181 @@ def get_all_authors():
     conn.close()
     return [dict(a) for a in authors]
 
+def iter_all_authors(batch_size=1000):
+    """
+    Like get_all_authors, but yields rows from an open cursor so large
+    listings can be streamed. The query runs before the first row is requested.
+    """
+    conn = get_db_connection()
+    c = conn.cursor()
+    try:
+        c.execute('SELECT * FROM authors')
+    except Exception:
+        conn.close()
+        raise
+
+    def rows():
+        try:
+            while True:
+                batch = c.fetchmany(batch_size)
+                if not batch:
+                    break
+                for a in batch:
+                    yield dict(a)
+        finally:
+            conn.close()
+    return rows()
+
+def get_prolific_authors(journal, min_papers=3, since=None):
+    """
+    Researchers with at least min_papers papers in a journal, optionally
+    only counting papers added since a timestamp ('YYYY-MM-DD[ HH:MM:SS]').
+    """
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute('''
+        SELECT r.id, r.name, count(*) AS paper_count,
+               (SELECT email FROM emails e WHERE e.researcher_id = r.id ORDER BY e.id LIMIT 1) AS email
+        FROM papers p
+        JOIN authorships s ON s.paper_id = p.id
+        JOIN researchers r ON r.id = s.researcher_id
+        WHERE p.journal = ? AND p.created_at >= ?
+        GROUP BY r.id
+        HAVING count(*) >= ?
+        ORDER BY paper_count DESC
+    ''', (journal, since or '', min_papers))
+    rows = c.fetchall()
+    conn.close()
+    return [dict(r) for r in rows]
+
+def _fts_query(text):
+    """
+    Turns free text into an FTS5 query: every term must match, and the
+    last term is treated as a prefix so results update while typing. A
+    one-letter last term is left out until it grows: the prefix index starts
+    at two letters, and expanding one letter scans most of the index.
+    """
+    terms = re.findall(r'\w+', text or '', flags=re.UNICODE)
+    if terms and len(terms[-1]) < 2:
+        terms.pop()
+    if not terms:
+        return None
+    quoted = ['"{}"'.format(t) for t in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+# Broad queries ("de", "department") match most of the table: only this many
+# hits are counted and ranked, so they cost about as much as narrow ones
+SEARCH_LIMIT = 1000
+
+def search_authors(query, page=1, per_page=50):
+    """
+    Ranked full-text search over name, affiliations and paper title.
+    Returns (results, total) for the requested page. Past SEARCH_LIMIT
+    matches, total is the string "1000+" and only the first SEARCH_LIMIT
+    matches are ranked and paged through.
+    """
+    match = _fts_query(query)
+    if not match:
+        return [], 0
+
+    conn = get_db_connection()
+    c = conn.cursor()
+    total = c.execute(
+        'SELECT count(*) FROM (SELECT 1 FROM authors_fts WHERE authors_fts MATCH ? LIMIT ?)',
+        (match, SEARCH_LIMIT + 1)
+    ).fetchone()[0]
+    if total > SEARCH_LIMIT:
+        total = f"{SEARCH_LIMIT}+"
+    # Weight name matches above affiliation and title matches
+    c.execute('''
+        SELECT a.* FROM (
+            SELECT rowid, bm25(authors_fts, 10.0, 2.0, 1.0) AS score FROM authors_fts
+            WHERE authors_fts MATCH ? LIMIT ?
+        ) hits
+        JOIN authors a ON a.id = hits.rowid
+        ORDER BY hits.score
+        LIMIT ? OFFSET ?
+    ''', (match, SEARCH_LIMIT, per_page, (page - 1) * per_page))
+    rows = c.fetchall()
+    conn.close()
+    return [dict(r) for r in rows], total
+
+def record_send_results(results, recipients=None):
+    """
+    Adds outreach outcomes to analytics_counts, counting each recipient once
+    by its latest outcome: a retry that fails again changes nothing, and one
+    that succeeds moves the recipient from failed to sent.
+    results: (email, success, error, outcome) tuples. recipients: optional
+    {email: record}, used for the journal of addresses not in the authors table.
+    """
+    recipients = recipients or {}
+    increments = {}
+    conn = get_db_connection()
+    try:
+        for email, success, *_ in results:
+            success = bool(success)
+            previous = conn.execute('SELECT success FROM send_outcomes WHERE email = ?', (email,)).fetchone()
+            if previous is not None and bool(previous['success']) == success:
+                continue
+            conn.execute('INSERT OR REPLACE INTO send_outcomes (email, success) VALUES (?, ?)', (email, success))
+            if previous is None:
+                delta = (1, 0) if success else (0, 1)
+            else:
+                delta = (1, -1) if success else (-1, 1)
+
+            row = conn.execute(
+                'SELECT journal, country, email_domain FROM authors WHERE email = ?', (email,)
+            ).fetchone()
+            if row:
+                groups = {'journal': row['journal'], 'country': row['country'], 'domain': row['email_domain']}
+            else:
+                groups = {'journal': recipients.get(email, {}).get('journal'), 'country': None,
+                          'domain': email.lower().rpartition('@')[2]}
+            for dimension, value in groups.items():
+                key = (dimension, (value or '').strip() or UNKNOWN_GROUP)
+                sent, failed = increments.get(key, (0, 0))
+                increments[key] = (sent + delta[0], failed + delta[1])
+
+        conn.executemany('''
+            INSERT INTO analytics_counts (dimension, value, sent, failed) VALUES (?, ?, ?, ?)
+            ON CONFLICT(dimension, value) DO UPDATE SET
+                sent = sent + excluded.sent,
+                failed = failed + excluded.failed
+        ''', [(dimension, value, sent, failed) for (dimension, value), (sent, failed) in increments.items()])
+        conn.commit()
+    finally:
+        conn.close()
+
+def get_analytics(dimension, limit=50, order_by='authors'):
+    """
+    Author and send counts per group of one dimension, largest first, plus
+    totals. Reads only the precomputed analytics_counts rows.
+    """
+    if dimension not in ANALYTICS_DIMENSIONS:
+        raise ValueError(f"Unknown dimension: {dimension}")
+    if order_by not in ('authors', 'sent', 'failed'):
+        raise ValueError(f"Unknown order: {order_by}")
+
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute('''
+        SELECT value, authors, sent, failed FROM analytics_counts
+        WHERE dimension = ? AND (authors > 0 OR sent > 0 OR failed > 0)
+        ORDER BY {} DESC, value
+        LIMIT ?
+    '''.format(order_by), (dimension, limit))
+    groups = [dict(r) for r in c.fetchall()]
+    c.execute('''
+        SELECT COUNT(*) AS groups, COALESCE(SUM(authors), 0) AS authors,
+               COALESCE(SUM(sent), 0) AS sent, COALESCE(SUM(failed), 0) AS failed
+        FROM analytics_counts
+        WHERE dimension = ? AND (authors > 0 OR sent > 0 OR failed > 0)
+    ''', (dimension,))
+    totals = dict(c.fetchone())
+    conn.close()
+    return groups, totals
+
 def export_to_csv():
     import csv
     import io
@@ -0,0 +1,264 @@
+"""
+Micro-benchmarks for the pure-Python hot functions of each pipeline stage.
+
+    python benchmark_stages.py                      # compare against benchmark_baseline.json
+    python benchmark_stages.py --sizes 1000 10000 100000
+    python benchmark_stages.py --update-baseline    # record new baseline numbers
+
+Each benchmark runs on synthetic fixtures of the given sizes and records
+throughput (records/s, best of --repeat samples) and peak traced memory. The run
+fails (exit 1) when throughput drops or memory grows past the tolerances
+relative to the stored baseline.
+"""
+import os
+import sys
+import gc
+import json
+import time
+import atexit
+import random
+import shutil
+import logging
+import argparse
+import tempfile
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "agents"))
+sys.path.append(os.path.join(ROOT, "backend"))
+
+# Give the root logger a handler before any agent is imported: their
+# setup_logging(stage) calls then return early, so benchmark runs never start
+# the queue listener or write to data/logs/bbrc_agent.log
+logging.basicConfig(level=logging.WARNING, handlers=[logging.NullHandler()])
+
+BASELINE_FILE = os.path.join(ROOT, "benchmark_baseline.json")
+DEFAULT_SIZES = [1000, 10000]
+MIN_SAMPLE_SECONDS = 0.2
+
+WORDS = ["gene", "protein", "cell", "cancer", "expression", "regulation", "analysis", "mouse",
+         "signaling", "pathway", "genetics", "clinical", "bioinformatics", "molecular", "response"]
+DOMAINS = ["harvard.edu", "ox.ac.uk", "uoguelph.ca", "yu.ac.kr", "163.com", "mit.edu"]
+
+class _Element(str):
+    """Stand-in for Bio.Entrez's StringElement (a str carrying XML attributes)."""
+
+    def __new__(cls, value, attributes=None):
+        obj = super().__new__(cls, value)
+        obj.attributes = attributes or {}
+        return obj
+
+def _affiliation(rng, i):
+    text = f"Department of {rng.choice(WORDS).capitalize()}, University {i % 500}, City, Country."
+    if rng.random() < 0.3:
+        text += f" person{i}@{rng.choice(DOMAINS)}."
+    return text
+
+def make_entrez_articles(n, seed=0):
+    rng = random.Random(seed)
+    articles = []
+    for i in range(n):
+        authors = [{
+            'LastName': f"Last{i}_{a}",
+            'ForeName': f"First{a}",
+            'AffiliationInfo': [{'Affiliation': _affiliation(rng, i * 10 + a)}]
+        } for a in range(rng.randint(3, 10))]
+        articles.append({'MedlineCitation': {
+            'PMID': _Element(str(40000000 + i)),
+            'Article': {
+                'ArticleTitle': " ".join(rng.choice(WORDS) for _ in range(12)),
+                'Journal': {'Title': f"Journal {i % 300}",
+                            'JournalIssue': {'PubDate': {'Year': '2026', 'Month': 'Feb', 'Day': '15'}}},
+                'AuthorList': authors,
+                'ELocationID': [_Element(f"10.1000/{i}", {'EIdType': 'doi'})]
+            }
+        }})
+    return articles
+
+def make_medline_payload(n, seed=0):
+    """An efetch rettype=medline response body for n papers."""
+    rng = random.Random(seed)
+    records = []
+    for i in range(n):
+        lines = [
+            f"PMID- {40000000 + i}",
+            f"TI  - {' '.join(rng.choice(WORDS) for _ in range(8))}",
+            f"      {' '.join(rng.choice(WORDS) for _ in range(4))}.",
+            f"LID - 10.1000/{i} [doi]",
+            f"AB  - {' '.join(rng.choice(WORDS) for _ in range(12))}",
+        ]
+        for a in range(rng.randint(3, 10)):
+            lines += [f"FAU - Last{i}_{a}, First{a}", f"AU  - Last{i}_{a} F", f"AD  - {_affiliation(rng, i * 10 + a)}"]
+        lines += ["DP  - 2026 Feb 15", f"JT  - Journal {i % 300}", "MH  - Humans", "PT  - Journal Article"]
+        records.append("\n".join(lines))
+    return "\n\n".join(records) + "\n"
+
+def make_papers(n, seed=0):
+    from utils.pubmed_api import parse_article
+    log = logging.getLogger("benchmark")
+    return [parse_article(a, log) for a in make_entrez_articles(n, seed)]
+
+def make_profiles(n, seed=0):
+    rng = random.Random(seed)
+    return [{
+        'name': f"First{i} Last{i}",
+        'first_name': f"First{i}",
+        'last_name': f"Last{i}",
+        'affiliations': [_affiliation(rng, i) for _ in range(rng.randint(1, 3))],
+        'paper_title': " ".join(rng.choice(WORDS) for _ in range(12)),
+        'paper_id': str(40000000 + i // 6),
+        'journal': f"Journal {i % 300}",
+        'emails': []
+    } for i in range(n)]
+
+def make_candidates(n, seed=0):
+    rng = random.Random(seed)
+    candidates = []
+    for i in range(n):
+        emails = [f"Person{i}@{rng.choice(DOMAINS)} ", f"alt{i}@{rng.choice(DOMAINS)}"][:rng.randint(1, 2)]
+        candidates.append({
+            'name': f"First{i} Last{i}", 'first_name': f"First{i}", 'emails': emails,
+            'paper_title': "Paper", 'journal': "Journal", 'paper_id': str(i)
+        })
+    history = {f"person{i}@{DOMAINS[0]}" for i in range(0, n, 10)}
+    return candidates, history
+
+# name -> (setup(size) -> state, run(state) -> None)
+def _bench_parse_article():
+    from utils.pubmed_api import PubMedAPI
+    api = PubMedAPI.__new__(PubMedAPI)
+    api.logger = logging.getLogger("benchmark")
+    return (lambda n: make_entrez_articles(n),
+            lambda articles: [api._parse_article(a) for a in articles])
+
+def _bench_parse_medline():
+    from utils.pubmed_api import parse_medline
+    log = logging.getLogger("benchmark")
+    return (lambda n: make_medline_payload(n), lambda payload: parse_medline(payload, log))
+
+def _bench_extract_authors():
+    import profiling_agent
+    return (lambda n: make_papers(n), profiling_agent.extract_authors)
+
+def _bench_process_profiles():
+    import email_discovery
+    return (lambda n: make_profiles(n), email_discovery.process_profiles)
+
+def _bench_find_emails():
+    import email_discovery
+    def run(texts):
+        for text in texts:
+            email_discovery.find_emails(text)
+    return (lambda n: [_affiliation(random.Random(i), i) for i in range(n)], run)
+
+def _bench_validate_and_dedup():
+    import validation_agent
+    return (lambda n: make_candidates(n), lambda state: validation_agent.validate_and_dedup(*state))
+
+def _bench_export_to_csv():
+    import database
+    from load_test_api import build_database
+
+    def setup(n):
+        tmp_dir = tempfile.mkdtemp(prefix="bbrc_bench_")
+        atexit.register(shutil.rmtree, tmp_dir, True)
+        path = os.path.join(tmp_dir, "authors.db")
+        build_database(path, n)
+        database.DB_PATH = path
+        return path
+    return (setup, lambda path: database.export_to_csv())
+
+BENCHMARKS = {
+    'parse_article': _bench_parse_article,
+    'parse_medline': _bench_parse_medline,
+    'extract_authors': _bench_extract_authors,
+    'process_profiles': _bench_process_profiles,
+    'find_emails': _bench_find_emails,
+    'validate_and_dedup': _bench_validate_and_dedup,
+    'export_to_csv': _bench_export_to_csv,
+}
+
+def measure(setup, run, size, repeat):
+    state = setup(size)
+
+    # Small fixtures run several times per sample so timer noise stays small
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            run(state)
+        if time.perf_counter() - started >= MIN_SAMPLE_SECONDS:
+            break
+        loops *= 2
+
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        for _ in range(loops):
+            run(state)
+        best = min(best, (time.perf_counter() - started) / loops)
+
+    gc.collect()
+    tracemalloc.start()
+    run(state)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'throughput': round(size / best, 1), 'seconds': round(best, 4), 'peak_kb': round(peak / 1024, 1)}
+
+def compare(results, baseline, throughput_tolerance, memory_tolerance):
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        if result['throughput'] < base['throughput'] * (1 - throughput_tolerance):
+            regressions.append(f"{key}: throughput {result['throughput']}/s vs baseline {base['throughput']}/s")
+        if result['peak_kb'] > base['peak_kb'] * (1 + memory_tolerance) + 64:
+            regressions.append(f"{key}: peak memory {result['peak_kb']} KB vs baseline {base['peak_kb']} KB")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="Run a subset of benchmarks")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--throughput-tolerance", type=float, default=0.40, help="Allowed fractional slowdown")
+    parser.add_argument("--memory-tolerance", type=float, default=0.25, help="Allowed fractional memory growth")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.only or BENCHMARKS:
+        setup, run = BENCHMARKS[name]()
+        for size in args.sizes:
+            key = f"{name}@{size}"
+            results[key] = measure(setup, run, size, args.repeat)
+            r = results[key]
+            print(f"{key:<28}{r['throughput']:>14.1f} rec/s{r['seconds']:>10.4f} s{r['peak_kb']:>12.1f} KB peak")
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline updated: {args.baseline}")
+        return
+
+    regressions = compare(results, baseline, args.throughput_tolerance, args.memory_tolerance)
+    if regressions:
+        print("\nRegressions:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print("\nNo regressions against baseline.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+Load test for the backend API against a synthetic authors database.
+
+    python load_test_api.py --authors 1000000 --concurrency 16 --requests 50
+    python load_test_api.py --mode gunicorn --workers 4 --db /tmp/bbrc_load.db
+
+Builds (or reuses) a synthetic authors.db, serves backend/app.py either with
+Werkzeug's threaded dev server in this process or with a local gunicorn, and
+drives the endpoints with concurrent clients. Reports p50/p95/p99 latency,
+throughput and server RSS per endpoint.
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import logging
+import sqlite3
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(ROOT, "backend"))
+
+DEFAULT_ENDPOINTS = ["authors", "authors/export", "stats", "logs", "config"]
+
+JOURNALS = ["Scientific reports", "Nature communications", "PloS one", "Cell reports",
+            "Journal of biological chemistry", "Bioinformatics", "Nucleic acids research"]
+DOMAINS = ["harvard.edu", "ox.ac.uk", "uoguelph.ca", "yu.ac.kr", "163.com", "gmail.com", "mit.edu", "u-tokyo.ac.jp"]
+COUNTRIES = ["United States", "United Kingdom", "Canada", "South Korea", "China", "Japan"]
+WORDS = ["gene", "protein", "cell", "cancer", "expression", "regulation", "analysis", "mouse",
+         "signaling", "pathway", "structure", "clinical", "trial", "molecular", "response"]
+
+def build_database(path, n_authors, seed=0):
+    """
+    Creates a synthetic database with the real schema and n_authors contacts,
+    spread over roughly n_authors / 6 papers.
+    """
+    import database
+
+    if os.path.exists(path):
+        os.remove(path)
+    database.DB_PATH = path
+    database.init_db()
+
+    rng = random.Random(seed)
+    n_papers = max(1, n_authors // 6)
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('PRAGMA journal_mode = MEMORY')
+
+    conn.executemany(
+        'INSERT INTO papers (id, pmid, doi, title, journal, pub_date) VALUES (?, ?, ?, ?, ?, ?)',
+        ((i, str(40000000 + i), f"10.1000/{i}",
+          " ".join(rng.choice(WORDS) for _ in range(10)).capitalize(),
+          rng.choice(JOURNALS), f"2026-{rng.choice(['Jan', 'Feb', 'Mar'])}-{rng.randint(1, 28):02d}")
+         for i in range(1, n_papers + 1))
+    )
+
+    def rows():
+        for i in range(1, n_authors + 1):
+            paper = rng.randint(1, n_papers)
+            name = f"Author{i} Lastname{i % 9973}"
+            email = f"author{i}@{rng.choice(DOMAINS)}"
+            affiliation = f"Department of {rng.choice(WORDS).capitalize()}, Institute {i % 5000}, {COUNTRIES[i % len(COUNTRIES)]}. {email}."
+            yield i, paper, name, email, affiliation
+
+    batch = []
+    for i, paper, name, email, affiliation in rows():
+        batch.append((i, paper, name, email, affiliation))
+        if len(batch) == 10000:
+            _insert_batch(conn, batch)
+            batch = []
+    if batch:
+        _insert_batch(conn, batch)
+
+    conn.commit()
+    conn.close()
+
+def _insert_batch(conn, batch):
+    conn.executemany(
+        'INSERT INTO authors (id, name, email, affiliations, paper_title, paper_id, journal, country, email_domain) '
+        'SELECT ?, ?, ?, ?, title, pmid, journal, ?, ? FROM papers WHERE id = ?',
+        ((i, name, email, json.dumps([affiliation]), COUNTRIES[i % len(COUNTRIES)], email.split('@')[1], paper)
+         for i, paper, name, email, affiliation in batch)
+    )
+    conn.executemany(
+        'INSERT INTO researchers (id, name) VALUES (?, ?)',
+        ((i, name) for i, _, name, _, _ in batch)
+    )
+    conn.executemany(
+        'INSERT INTO emails (email, domain, researcher_id) VALUES (?, ?, ?)',
+        ((email, email.split('@')[1], i) for i, _, _, email, _ in batch)
+    )
+    conn.executemany(
+        'INSERT INTO authorships (researcher_id, paper_id, position, affiliation) VALUES (?, ?, 1, ?)',
+        ((i, paper, affiliation) for i, paper, _, _, affiliation in batch)
+    )
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def rss_kb(pid):
+    """Resident set size of a process (Linux /proc)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+def child_pids(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+class InProcessServer:
+    """backend/app.py on Werkzeug's threaded server, in this process."""
+
+    def __init__(self, db_path):
+        from werkzeug.serving import make_server
+        import database
+        database.DB_PATH = db_path
+        import app as backend_app
+        # Per-request access lines would dominate the output
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        self.port = free_port()
+        self.server = make_server("127.0.0.1", self.port, backend_app.app, threaded=True)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def rss_kb(self):
+        return rss_kb(os.getpid())
+
+    def stop(self):
+        self.server.shutdown()
+
+class GunicornServer:
+    """backend.app:app under a local gunicorn with N workers."""
+
+    def __init__(self, db_path, workers):
+        self.port = free_port()
+        env = dict(os.environ, BBRC_DB_PATH=db_path)
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-w", str(workers), "-b", f"127.0.0.1:{self.port}",
+             "--timeout", "300", "backend.app:app"],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+
+    def start(self):
+        deadline = time.time() + 60
+        while time.time() < deadline:
+            try:
+                requests.get(f"http://127.0.0.1:{self.port}/api/status", timeout=1)
+                return
+            except requests.RequestException:
+                time.sleep(0.5)
+        raise RuntimeError("gunicorn did not start")
+
+    def rss_kb(self):
+        return sum(rss_kb(pid) for pid in child_pids(self.proc.pid))
+
+    def stop(self):
+        self.proc.terminate()
+        self.proc.wait()
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def drive_endpoint(base_url, endpoint, concurrency, total_requests, server):
+    """
+    Fires total_requests GETs at one endpoint from concurrency client threads.
+    """
+    latencies = []
+    errors = 0
+    peak_rss = server.rss_kb()
+    lock = threading.Lock()
+    sessions = threading.local()
+
+    def one(_):
+        nonlocal errors, peak_rss
+        if not hasattr(sessions, "s"):
+            sessions.s = requests.Session()
+        start = time.perf_counter()
+        try:
+            response = sessions.s.get(f"{base_url}/{endpoint}", timeout=600)
+            _ = response.content
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors += 1
+            peak_rss = max(peak_rss, server.rss_kb())
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total_requests)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "endpoint": endpoint,
+        "requests": total_requests,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "throughput_rps": round(total_requests / wall, 2) if wall else 0.0,
+        "server_rss_mb": round(peak_rss / 1024, 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="/tmp/bbrc_load.db", help="Synthetic database path")
+    parser.add_argument("--authors", type=int, default=1000000, help="Synthetic author rows to generate")
+    parser.add_argument("--reuse-db", action="store_true", help="Skip generation if --db exists")
+    parser.add_argument("--mode", choices=["inprocess", "gunicorn"], default="inprocess")
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn workers")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=20, help="Requests per endpoint")
+    parser.add_argument("--endpoints", nargs="+", default=DEFAULT_ENDPOINTS)
+    parser.add_argument("--json", help="Also write results to this file")
+    args = parser.parse_args()
+
+    if not (args.reuse_db and os.path.exists(args.db)):
+        print(f"Generating {args.authors} synthetic authors in {args.db}...")
+        started = time.time()
+        build_database(args.db, args.authors)
+        print(f"Generated in {time.time() - started:.1f}s ({os.path.getsize(args.db) / 1e6:.0f} MB)")
+
+    server = InProcessServer(args.db) if args.mode == "inprocess" else GunicornServer(args.db, args.workers)
+    server.start()
+    base_url = f"http://127.0.0.1:{server.port}/api"
+
+    results = []
+    try:
+        for endpoint in args.endpoints:
+            print(f"Testing {endpoint}...")
+            results.append(drive_endpoint(base_url, endpoint, args.concurrency, args.requests, server))
+    finally:
+        server.stop()
+
+    header = f"{'endpoint':<18}{'req':>6}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}{'RSS MB':>9}"
+    print("\n" + header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['endpoint']:<18}{r['requests']:>6}{r['errors']:>5}{r['p50_ms']:>10}{r['p95_ms']:>10}"
+              f"{r['p99_ms']:>10}{r['throughput_rps']:>9}{r['server_rss_mb']:>9}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"mode": args.mode, "authors": args.authors, "results": results}, f, indent=2)
+
+    if any(r["errors"] for r in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
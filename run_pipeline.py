@@ -5,13 +5,18 @@ import os
 import glob
 import json
 
+from utils import run_catalog
+from utils.campaign import CURRENT as CAMPAIGN
+
 BASE_URL = "http://127.0.0.1:5000/api"
-DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+# Run for another campaign with BBRC_CAMPAIGN=<name> python run_pipeline.py
+DATA_DIR = CAMPAIGN.data_dir
 
 def trigger_agent(name):
     print(f"\n--- Triggering Agent: {name} ---")
     try:
-        response = requests.post(f"{BASE_URL}/agents/{name}/start")
+        params = {"campaign": CAMPAIGN.name} if CAMPAIGN.name else None
+        response = requests.post(f"{BASE_URL}/agents/{name}/start", params=params)
         if response.status_code == 200:
             print(f"Agent {name} started successfully.")
             return True
@@ -22,29 +27,34 @@ def trigger_agent(name):
         print(f"Error connecting to API: {e}")
         return False
 
-def wait_for_file_change(directory, pattern, timeout=60):
-    print(f"Watching {directory} for changes...")
+def wait_for_new_run(stage, previous_run_id, timeout=60):
+    print(f"Watching run catalog for a new {stage} run...")
     start_time = time.time()
-    initial_files = set(glob.glob(os.path.join(directory, pattern)))
     
     while time.time() - start_time < timeout:
-        current_files = set(glob.glob(os.path.join(directory, pattern)))
-        new_files = current_files - initial_files
-        if new_files:
-            print(f"New files detected: {new_files}")
-            return list(new_files)[0]
+        run = run_catalog.latest_run(stage)
+        if run and run['run_id'] != previous_run_id:
+            print(f"New run detected: {run['run_id']}")
+            if run['status'] == 'incomplete':
+                print("Some keywords could not be fetched; continuing with the ones that finished.")
+            return run['artifact_path']
         time.sleep(2)
         
-    print("Timeout waiting for file changes.")
+    print("Timeout waiting for a new run.")
     return None
 
+def current_run_id(stage):
+    run = run_catalog.latest_run(stage)
+    return run['run_id'] if run else None
+
 def main():
     # 1. Discovery Agent
+    previous_run = current_run_id("discovery")
     if trigger_agent("discovery"):
         print("Waiting for papers...")
         # Discovery agent writes to data/raw_papers/papers_YYYYMMDD_HHMMSS.json
         # It takes some time to fetch from PubMed
-        new_file = wait_for_file_change(os.path.join(DATA_DIR, "raw_papers"), "*.json", timeout=120)
+        new_file = wait_for_new_run("discovery", previous_run, timeout=120)
         if new_file:
             with open(new_file, 'r') as f:
                 papers = json.load(f)
@@ -0,0 +1,64 @@
+import os
+import sys
+import time
+import logging
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils import logging_setup
+from utils.logging_setup import RateLimitFilter
+
+def record(message):
+    return logging.LogRecord("test", logging.INFO, __file__, 1, message, (), None)
+
+def test_repeats_are_limited_and_counted():
+    limiter = RateLimitFilter(burst=2, interval=60)
+    assert [limiter.filter(record("same")) for _ in range(5)] == [True, True, False, False, False]
+    assert all(limiter.filter(record(f"Skipping r{n}@example.org")) for n in range(50))
+    assert limiter.drain() == [("test", 3)]
+
+def test_evicted_drops_are_still_reported():
+    limiter = RateLimitFilter(burst=1, interval=60)
+    limiter.MAX_SITES = 10
+    for _ in range(3):
+        limiter.filter(record("noisy"))
+    for n in range(20):
+        limiter.filter(record(f"distinct {n}"))
+    assert len(limiter._sites) == 10
+    assert limiter.drain() == [("test", 2)]
+
+def test_many_distinct_messages_stay_linear():
+    def elapsed(count):
+        limiter = RateLimitFilter(burst=20, interval=60)
+        start = time.perf_counter()
+        for n in range(count):
+            limiter.filter(record(f"Skipping r{n}@example.org - already in history"))
+        return time.perf_counter() - start
+
+    elapsed(RateLimitFilter.MAX_SITES)  # warm-up
+    small = elapsed(2 * RateLimitFilter.MAX_SITES)
+    large = elapsed(8 * RateLimitFilter.MAX_SITES)
+    # 4x the messages: linear is ~4x; the old pruning was quadratic (~16x and seconds)
+    assert large < 8 * small + 0.05, (small, large)
+    assert large < 2.0, large
+
+def test_importing_an_agent_keeps_the_workers_context():
+    root = logging.getLogger()
+    saved_handlers, saved_context = root.handlers[:], dict(logging_setup._context)
+    root.handlers = []
+    try:
+        logging_setup.setup_logging("worker", config={'log_file': os.path.join(tempfile.mkdtemp(), "agent.log")})
+        # What an agent module runs at import
+        logging_setup.setup_logging("outreach")
+        assert logging_setup._context['stage'] == "worker"
+    finally:
+        logging_setup.shutdown()
+        root.handlers = saved_handlers
+        logging_setup._context.update(saved_context)
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"{test.__name__}: ok")
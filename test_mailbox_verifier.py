@@ -0,0 +1,103 @@
+import os
+import sys
+import tempfile
+import threading
+import socketserver
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.mailbox_verifier import MailboxVerifier, VALID, INVALID, CATCH_ALL, UNKNOWN
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    """
+    Minimal SMTP stand-in: answers RCPT TO with rcpt_reply(address), e.g.
+    "550 5.1.1 User unknown", and accepts everything else.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, rcpt_reply):
+        super().__init__(('127.0.0.1', 0), FakeSMTPHandler)
+        self.rcpt_reply = rcpt_reply
+        self.rcpts = []
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+class FakeSMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        self.reply("220 fake ESMTP")
+        for raw in self.rfile:
+            line = raw.decode().strip()
+            command = line[:4].upper()
+            if command in ("EHLO", "HELO"):
+                self.reply("250 fake")
+            elif command == "RCPT":
+                address = line.split(":", 1)[1].strip().strip("<>")
+                self.server.rcpts.append(address)
+                self.reply(self.server.rcpt_reply(address))
+            elif command == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 OK")
+
+def verify(rcpt_reply, emails):
+    """Runs a verifier against a fake server; returns (results, cached)."""
+    server = FakeSMTPServer(rcpt_reply)
+    cache_path = os.path.join(tempfile.mkdtemp(), "mailbox_cache.db")
+    verifier = MailboxVerifier("probe@example.org", cache_path=cache_path,
+                               host_override="127.0.0.1", port=server.port, timeout=5)
+    try:
+        results = verifier.verify(emails)
+        cached = dict(verifier.cache.execute('SELECT email, status FROM mailbox_cache'))
+    finally:
+        verifier.close()
+        server.stop()
+    return results, cached
+
+def test_valid_and_missing_mailboxes():
+    def reply(address):
+        return "250 OK" if address.startswith("alice@") else "550 5.1.1 User unknown"
+
+    results, cached = verify(reply, ["alice@uni.edu", "bob@uni.edu"])
+    assert results == {"alice@uni.edu": VALID, "bob@uni.edu": INVALID}
+    assert cached == results
+
+def test_catch_all_domain():
+    results, _ = verify(lambda address: "250 OK", ["alice@uni.edu", "bob@uni.edu"])
+    assert results == {"alice@uni.edu": CATCH_ALL, "bob@uni.edu": CATCH_ALL}
+
+def test_policy_block_is_unknown():
+    results, cached = verify(lambda address: "554 5.7.1 Client host blocked", ["alice@uni.edu"])
+    assert results == {"alice@uni.edu": UNKNOWN}
+    assert cached == {}
+
+def test_same_refusal_for_probe_and_addresses_is_unknown():
+    # A bare 550 for the random probe and every address: the server refuses us
+    results, cached = verify(lambda address: "550 Access denied", ["alice@uni.edu", "bob@uni.edu"])
+    assert results == {"alice@uni.edu": UNKNOWN, "bob@uni.edu": UNKNOWN}
+    assert cached == {}
+
+def test_temporary_failure_is_unknown():
+    def reply(address):
+        return "550 5.1.1 User unknown" if "probe" in address else "451 4.7.1 Try again later"
+
+    results, cached = verify(reply, ["alice@uni.edu"])
+    assert results == {"alice@uni.edu": UNKNOWN}
+    assert cached == {}
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"{test.__name__}: ok")
@@ -0,0 +1,54 @@
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.rate_limiter import SharedRateLimiter, SharedCircuitBreaker
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+def test_limiter_slots_are_shared():
+    path = os.path.join(tempfile.mkdtemp(), "rate_limits.db")
+    clock = FakeClock()
+    first = SharedRateLimiter("ncbi", 0.5, path=path, clock=clock, sleep=clock.sleep)
+    second = SharedRateLimiter("ncbi", 0.5, path=path, clock=clock, sleep=clock.sleep)
+    assert [first.reserve(), second.reserve(), first.reserve()] == [1000.0, 1000.5, 1001.0]
+    first.close()
+    second.close()
+
+def test_breaker_opens_for_every_process():
+    path = os.path.join(tempfile.mkdtemp(), "rate_limits.db")
+    clock = FakeClock()
+    # Two processes' breakers: failures count towards the same threshold
+    first, second = (SharedCircuitBreaker("ncbi", failure_threshold=3, cooldown=60, path=path,
+                                          clock=clock, sleep=clock.sleep) for _ in range(2))
+    first.failure()
+    second.failure()
+    first.wait()
+    assert clock.now == 1000.0
+    second.failure()
+
+    first.wait()
+    assert clock.now == 1060.0
+    # Any success closes it again
+    second.success()
+    first.failure()
+    second.wait()
+    assert clock.now == 1060.0
+    first.close()
+    second.close()
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"{test.__name__}: ok")
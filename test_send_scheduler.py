@@ -0,0 +1,82 @@
+import os
+import sys
+import smtplib
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.send_scheduler import (SendScheduler, Relay, DeliveryUnknown,
+                                  ACCEPTED, REJECTED, RELAY_ERROR, UNKNOWN, ERROR)
+
+class FakeRelay(Relay):
+    """A relay that raises errors[email] for that recipient, or accepts."""
+
+    def __init__(self, name, errors=None):
+        super().__init__(name, "smtp.example.org", 465, f"{name}@example.org", "secret",
+                         initial_interval=0, min_interval=0)
+        self.errors = errors or {}
+        self.sent = []
+        self.throttles = 0
+
+    def send(self, msg):
+        error = self.errors.get(msg['To'])
+        if error is not None:
+            raise error
+        self.sent.append(msg['To'])
+
+    def throttled(self):
+        self.throttles += 1
+        super().throttled()
+
+def build(candidate, relay):
+    return {'To': candidate['email']}
+
+def run(relays, emails, build_message=build):
+    scheduler = SendScheduler(relays, domain_interval=0, min_interval=0)
+    deferred = []
+    results = scheduler.run([{'email': email} for email in emails], build_message, on_deferred=deferred.append)
+    return {email: outcome for email, _, _, outcome in results}, deferred
+
+def test_refused_login_stops_the_relay_and_others_take_over():
+    login = smtplib.SMTPAuthenticationError(535, b"Authentication failed")
+    broken = FakeRelay("broken", errors={f"r{n}@example.org": login for n in range(4)})
+    working = FakeRelay("working")
+    emails = [f"r{n}@example.org" for n in range(4)]
+
+    outcomes, _ = run([broken, working], emails)
+    assert outcomes == dict.fromkeys(emails, ACCEPTED)
+    assert sorted(working.sent) == emails
+    assert broken.error is login and working.error is None
+
+def test_no_healthy_relay_returns_the_rest_unattempted():
+    login = smtplib.SMTPAuthenticationError(535, b"Authentication failed")
+    relay = FakeRelay("only", errors={"a@one.org": login, "b@two.org": login})
+
+    outcomes, deferred = run([relay], ["a@one.org", "b@two.org"])
+    assert outcomes == {"a@one.org": RELAY_ERROR, "b@two.org": RELAY_ERROR}
+    assert len(deferred) == 1
+    # Still stopped on the next batch
+    assert run([relay], ["c@three.org"])[0] == {"c@three.org": RELAY_ERROR}
+
+def test_recipient_outcomes():
+    relay = FakeRelay("relay", errors={
+        "gone@example.org": smtplib.SMTPRecipientsRefused({"gone@example.org": (550, b"User unknown")}),
+        "lost@example.org": DeliveryUnknown("Connection unexpectedly closed"),
+    })
+
+    def build_message(candidate, relay):
+        if candidate['email'] == "bad@example.org":
+            raise KeyError('first_name')
+        return build(candidate, relay)
+
+    emails = ["ok@example.org", "gone@example.org", "lost@example.org", "bad@example.org"]
+    outcomes, deferred = run([relay], emails, build_message)
+    assert outcomes == {"ok@example.org": ACCEPTED, "gone@example.org": REJECTED,
+                        "lost@example.org": UNKNOWN, "bad@example.org": ERROR}
+    # None of these is the relay's fault
+    assert deferred == [] and relay.error is None and relay.throttles == 0
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"{test.__name__}: ok")
@@ -0,0 +1,151 @@
+import os
+import sys
+import time
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.work_queue import MemoryQueue, SQLiteQueue, process_one, iter_group, PENDING, LEASED, DONE, DEAD
+from utils.send_journal import SendJournal, QUEUED, SENT, SENDING, FAILED
+from utils.send_scheduler import DEFERRED, REJECTED, RELAY_ERROR
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def test_expired_lease_is_handed_out_again():
+    clock = FakeClock()
+    queue = MemoryQueue(visibility_timeout=10, max_attempts=3, clock=clock)
+    queue.enqueue("g", "k", [{"n": 1}])
+
+    first = queue.lease(worker="dead")
+    assert queue.lease(worker="other") is None
+    clock.now += 11
+    second = queue.lease(worker="other")
+    assert second.id == first.id and second.attempts == 2
+
+    # The first worker's lease is gone: its late result is refused
+    assert not queue.ack(first, "late")
+    assert queue.ack(second, "ok")
+    assert [(t.state, t.result) for t in queue.results("g")] == [(DONE, "ok")]
+
+def test_dead_after_max_attempts():
+    clock = FakeClock()
+    queue = MemoryQueue(visibility_timeout=10, max_attempts=2, retry_delay=1, clock=clock)
+    queue.enqueue("g", "k", [{"n": 1}, {"n": 2}])
+
+    # Task 1: both leases expire
+    for _ in range(2):
+        assert queue.lease(kinds=["k"]).payload == {"n": 1}
+        clock.now += 11
+    # Task 2: fails twice
+    for _ in range(2):
+        task = queue.lease()
+        assert task.payload == {"n": 2}
+        queue.fail(task, "boom")
+        clock.now += 5
+
+    assert queue.lease() is None
+    assert [(t.state, t.error) for t in queue.results("g")] == [(DEAD, "lease expired"), (DEAD, "boom")]
+
+def test_heartbeat_keeps_a_slow_task_leased():
+    path = os.path.join(tempfile.mkdtemp(), "queue.db")
+    queue = SQLiteQueue(path, visibility_timeout=0.3)
+    other = SQLiteQueue(path, visibility_timeout=0.3)
+    queue.enqueue("g", "slow", [{}])
+    stolen = []
+
+    def slow(payload, campaign):
+        # Well past the visibility timeout; nobody else may get the task meanwhile
+        for _ in range(5):
+            time.sleep(0.2)
+            stolen.append(other.lease())
+        return "done"
+
+    task = process_one(queue, {"slow": slow})
+    assert stolen == [None] * 5
+    assert [(t.state, t.attempts, t.result) for t in queue.results(task.group)] == [(DONE, 1, "done")]
+    queue.close()
+    other.close()
+
+def test_iter_group_removes_a_task_only_after_it_is_consumed():
+    queue = MemoryQueue()
+    queue.enqueue("g", "k", [{"n": n} for n in range(3)])
+    seen = []
+    for task in iter_group(queue, "g", {"k": lambda payload, campaign: payload["n"] * 10}, poll_interval=0):
+        assert task.id in queue.tasks
+        seen.append(task.result)
+    assert sorted(seen) == [0, 10, 20]
+    assert queue.results("g") == []
+
+def test_send_task_lost_with_its_worker_is_not_redelivered():
+    from agents import outreach_agent
+
+    clock = FakeClock()
+    journal = SendJournal(os.path.join(tempfile.mkdtemp(), "journal.db"))
+    recipients = [{"email": f"r{n}@example.org"} for n in range(4)]
+    journal.enqueue(recipients)
+    batch = journal.claim(4)
+
+    class QueueWithCrashingWorker(MemoryQueue):
+        def enqueue(self, *args, **kwargs):
+            ids = super().enqueue(*args, **kwargs)
+            # Another worker leases the first relay's task and dies
+            self.lost = self.lease(worker="crashed")
+            clock.now += 301
+            return ids
+
+    handled = []
+
+    def send_task(payload, campaign):
+        handled.append(payload["relay"])
+        return [(c["email"], True, None, "accepted") for c in payload["recipients"]]
+
+    original = outreach_agent.send_task
+    outreach_agent.send_task = send_task
+    try:
+        queue = QueueWithCrashingWorker(clock=clock)
+        results, in_doubt = [], set()
+        outreach_agent.send_queued(queue, journal, batch, [0, 1], lambda r: journal.complete([r]) or results.append(r),
+                                   in_doubt, poll_interval=0)
+    finally:
+        outreach_agent.send_task = original
+
+    lost = {c["email"] for c in queue.lost.payload["recipients"]}
+    assert handled == [1]
+    assert in_doubt == lost
+    states = dict(journal.conn.execute("SELECT email, state FROM sends"))
+    assert all(states[email] == (SENDING if email in lost else SENT) for email in states)
+    assert queue.counts() == dict.fromkeys((PENDING, LEASED, DONE, DEAD), 0)
+    journal.close()
+
+def test_journal_failures_by_outcome():
+    journal = SendJournal(os.path.join(tempfile.mkdtemp(), "journal.db"), max_retries=3, retry_delay=3600)
+    emails = ["gone@example.org", "busy@example.org", "relay@example.org"]
+    journal.enqueue([{"email": email} for email in emails])
+    journal.claim(3)
+    journal.start(emails)
+    journal.complete([
+        ("gone@example.org", False, "550 5.1.1 User unknown", REJECTED),
+        ("busy@example.org", False, "451 4.7.1 Try again later", DEFERRED),
+        ("relay@example.org", False, "535 Authentication failed", RELAY_ERROR),
+    ])
+
+    rows = {email: (state, attempts) for email, state, attempts in
+            journal.conn.execute("SELECT email, state, attempts FROM sends")}
+    assert rows == {"gone@example.org": (FAILED, 1), "busy@example.org": (QUEUED, 1),
+                    "relay@example.org": (QUEUED, 0)}
+    # Failed in this run: not handed out again until retry_delay has passed
+    assert journal.claim(3) == []
+    journal.conn.execute("UPDATE sends SET next_attempt_at = 0")
+    assert sorted(c["email"] for c in journal.claim(3)) == ["busy@example.org", "relay@example.org"]
+    journal.close()
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"{test.__name__}: ok")
@@ -0,0 +1,115 @@
+"""
+Campaigns: isolated workspaces so several outreach campaigns can run at once.
+
+The default campaign is the repository's own config/ and data/. A named
+campaign lives in campaigns/<name>/:
+
+    campaigns/<name>/settings.yaml             overrides on top of config/settings.yaml
+    campaigns/<name>/keywords.json             falls back to config/keywords.json
+    campaigns/<name>/templates/cfp_email.txt   falls back to config/templates/cfp_email.txt
+    campaigns/<name>/data/                     raw papers, profiles, lists, run catalog, journal
+
+The campaign of a process is chosen with the BBRC_CAMPAIGN environment
+variable, which child processes inherit. The PubMed paper cache, the
+suppression history, the mailbox cache and the agent log stay shared.
+"""
+import os
+import re
+import copy
+import json
+
+import yaml
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_DIR = os.path.join(BASE_DIR, "config")
+CAMPAIGNS_DIR = os.path.join(BASE_DIR, "campaigns")
+SHARED_DATA_DIR = os.path.join(BASE_DIR, "data")
+ENV_VAR = "BBRC_CAMPAIGN"
+
+def _merge(base, overrides):
+    merged = copy.deepcopy(base)
+    for key, value in (overrides or {}).items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+class Campaign:
+    def __init__(self, name=None, root=CAMPAIGNS_DIR):
+        if name and not re.fullmatch(r'[A-Za-z0-9_-]+', name):
+            raise ValueError(f"Invalid campaign name: {name!r}")
+        self.name = name or None
+        if self.name:
+            self.root = os.path.join(root, self.name)
+            self.config_path = os.path.join(self.root, "settings.yaml")
+            self.data_dir = os.path.join(self.root, "data")
+        else:
+            self.root = BASE_DIR
+            self.config_path = os.path.join(CONFIG_DIR, "settings.yaml")
+            self.data_dir = SHARED_DATA_DIR
+
+    @classmethod
+    def from_env(cls):
+        return cls(os.environ.get(ENV_VAR) or None)
+
+    @classmethod
+    def list_names(cls, root=CAMPAIGNS_DIR):
+        if not os.path.isdir(root):
+            return []
+        return sorted(name for name in os.listdir(root) if os.path.isdir(os.path.join(root, name)))
+
+    def own_file(self, relative):
+        """Where this campaign's own copy of a config file lives (written by the API)."""
+        return os.path.join(self.root if self.name else CONFIG_DIR, relative)
+
+    def _own_or_default(self, relative):
+        own = self.own_file(relative)
+        return own if os.path.exists(own) else os.path.join(CONFIG_DIR, relative)
+
+    @property
+    def keywords_path(self):
+        return self._own_or_default("keywords.json")
+
+    @property
+    def template_path(self):
+        return self._own_or_default(os.path.join("templates", "cfp_email.txt"))
+
+    def path(self, relative):
+        """Absolute path of a file under this campaign's data root; creates its directory."""
+        full = os.path.join(self.data_dir, relative)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        return full
+
+    def load_config(self):
+        with open(os.path.join(CONFIG_DIR, "settings.yaml"), "r") as f:
+            config = yaml.safe_load(f) or {}
+        if self.name and os.path.exists(self.config_path):
+            with open(self.config_path, "r") as f:
+                config = _merge(config, yaml.safe_load(f))
+        return config
+
+    def load_keywords(self):
+        with open(self.keywords_path, "r") as f:
+            return json.load(f)
+
+    def load_template(self):
+        with open(self.template_path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def create(self, keywords=None, settings=None):
+        """Creates the campaign directory with optional keywords and setting overrides."""
+        if not self.name:
+            raise ValueError("The default campaign always exists")
+        os.makedirs(self.data_dir, exist_ok=True)
+        if keywords is not None:
+            with open(self.own_file("keywords.json"), "w") as f:
+                json.dump(keywords, f, indent=2)
+        if settings is not None:
+            with open(self.config_path, "w") as f:
+                yaml.dump(settings, f)
+        return self
+
+# The campaign of this process
+CURRENT = Campaign.from_env()
+DATA_DIR = CURRENT.data_dir
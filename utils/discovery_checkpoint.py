@@ -0,0 +1,109 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+
+from utils.campaign import DATA_DIR
+
+CHECKPOINT_DIR = os.path.join(DATA_DIR, "checkpoints")
+
+class DiscoveryCheckpoint:
+    """
+    Per-keyword, per-batch progress of a discovery run. A run that fails part
+    way keeps its checkpoint, and the next run with the same keyword set and
+    search settings resumes it, whatever the day, fetching only what is
+    missing. Checkpoints nobody resumes are pruned after a week.
+
+    Layout: <dir>/state.json holds the run that started the checkpoint and
+    each keyword's PMID list and completed batch indexes; <dir>/papers.jsonl
+    holds the papers of completed batches, one {"keyword", "paper"} per line.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.state_file = os.path.join(path, "state.json")
+        self.papers_file = os.path.join(path, "papers.jsonl")
+        os.makedirs(path, exist_ok=True)
+        self.resumed = os.path.exists(self.state_file)
+        if self.resumed:
+            with open(self.state_file, 'r') as f:
+                self.state = json.load(f)
+        else:
+            self.state = {'keywords': {}}
+
+    @classmethod
+    def for_run(cls, keywords, search_settings, run_id=None, root=CHECKPOINT_DIR):
+        key_source = json.dumps([sorted(set(keywords)), search_settings], sort_keys=True)
+        key = hashlib.sha1(key_source.encode('utf-8')).hexdigest()[:12]
+        checkpoint = cls(os.path.join(root, f"discovery_{key}"))
+        if not checkpoint.resumed:
+            checkpoint.state['run_id'] = run_id
+            checkpoint._save()
+        return checkpoint
+
+    @property
+    def run_id(self):
+        """The run that started this checkpoint."""
+        return self.state.get('run_id')
+
+    @staticmethod
+    def prune_stale(max_age_days=7, root=CHECKPOINT_DIR):
+        """Removes checkpoints of runs that were never resumed."""
+        if not os.path.isdir(root):
+            return
+        cutoff = time.time() - max_age_days * 86400
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _save(self):
+        tmp = self.state_file + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.state_file)
+
+    def keyword(self, keyword):
+        return self.state['keywords'].setdefault(keyword, {'ids': None, 'done_batches': [], 'complete': False})
+
+    def set_ids(self, keyword, ids):
+        self.keyword(keyword)['ids'] = ids
+        self._save()
+
+    def add_batch(self, keyword, index, papers):
+        # Papers first, then state: a crash in between only refetches the batch
+        with open(self.papers_file, 'a') as f:
+            for paper in papers:
+                f.write(json.dumps({'keyword': keyword, 'paper': paper}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.keyword(keyword)['done_batches'].append(index)
+        self._save()
+
+    def mark_complete(self, keyword):
+        self.keyword(keyword)['complete'] = True
+        self._save()
+
+    def complete_keywords(self):
+        return [keyword for keyword, state in self.state['keywords'].items() if state['complete']]
+
+    def iter_papers(self, keywords=None):
+        """Papers of completed batches, optionally only those found for the given keywords."""
+        if not os.path.exists(self.papers_file):
+            return
+        keywords = set(keywords) if keywords is not None else None
+        with open(self.papers_file, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Torn write from a crash; that batch was never marked done
+                    continue
+                if keywords is None or entry['keyword'] in keywords:
+                    yield entry['paper']
+
+    def clear(self):
+        shutil.rmtree(self.path, ignore_errors=True)
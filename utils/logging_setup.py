@@ -0,0 +1,249 @@
+"""
+Shared logging for the agents.
+
+Records are put on an in-memory queue by the calling thread and written by a
+background listener, so log I/O stays off the hot path. The log file holds one
+JSON object per line (with the stage, run_id and campaign of the process that wrote it)
+and rotates by size under a file lock, so several agent processes can share it.
+INFO/DEBUG messages repeated word for word are rate-limited, with a count of
+what was dropped.
+"""
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import datetime
+import threading
+from collections import Counter, OrderedDict
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+import yaml
+
+from utils.campaign import CURRENT
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_PATH = os.path.join(BASE_DIR, "config/settings.yaml")
+DEFAULT_LOG_FILE = "data/logs/bbrc_agent.log"
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_context = {'stage': None, 'run_id': None, 'campaign': None}
+_listener = None
+_rate_limiter = None
+
+def set_run_id(run_id):
+    """Tags records logged from now on with a run catalog id."""
+    _context['run_id'] = run_id
+
+class ContextFilter(logging.Filter):
+    def filter(self, record):
+        record.stage = _context['stage']
+        record.run_id = _context['run_id']
+        record.campaign = _context['campaign']
+        return True
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets through at most `burst` copies of the same INFO/DEBUG message (same
+    logger and formatted text) every `interval` seconds. The next copy that
+    passes carries the number dropped in between. Messages that differ in any
+    value are never limited, and neither are warnings and errors.
+    """
+
+    # Most messages tracked at once; the least recently seen is evicted first
+    MAX_SITES = 10000
+
+    def __init__(self, burst=20, interval=60.0):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self._sites = OrderedDict()
+        # Drops of evicted messages not yet reported, per logger name
+        self._evicted = Counter()
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, record.getMessage())
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.interval:
+                suppressed = site[2] if site else 0
+                self._sites[key] = [now, 1, 0]
+            elif site[1] < self.burst:
+                site[1] += 1
+                suppressed = 0
+            else:
+                site[2] += 1
+                self._sites.move_to_end(key)
+                return False
+            self._sites.move_to_end(key)
+            if len(self._sites) > self.MAX_SITES:
+                (name, _), evicted = self._sites.popitem(last=False)
+                if evicted[2]:
+                    self._evicted[name] += evicted[2]
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+    def drain(self):
+        """Returns (logger name, dropped count) for unreported drops and resets all sites."""
+        with self._lock:
+            pending = Counter(self._evicted)
+            for (name, _), site in self._sites.items():
+                pending[name] += site[2]
+            self._sites.clear()
+            self._evicted.clear()
+        return [(name, count) for name, count in pending.items() if count]
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'stage': getattr(record, 'stage', None),
+            'run_id': getattr(record, 'run_id', None),
+            'campaign': getattr(record, 'campaign', None),
+            'message': record.getMessage()
+        }
+        if getattr(record, 'suppressed', 0):
+            entry['suppressed'] = record.suppressed
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        text = super().format(record)
+        if getattr(record, 'suppressed', 0):
+            text += f" (+{record.suppressed} identical messages suppressed)"
+        return text
+
+def format_line(line):
+    """Renders a JSON log line in the text format; other lines are returned as-is."""
+    line = line.strip()
+    if not line.startswith('{'):
+        return line
+    try:
+        entry = json.loads(line)
+        ts = datetime.datetime.fromisoformat(entry['ts'])
+    except (ValueError, KeyError):
+        return line
+    text = (f"{ts.strftime('%Y-%m-%d %H:%M:%S')},{ts.microsecond // 1000:03d} - "
+            f"{entry.get('logger')} - {entry.get('level')} - {entry.get('message')}")
+    if entry.get('suppressed'):
+        text += f" (+{entry['suppressed']} identical messages suppressed)"
+    if entry.get('exc'):
+        text += "\n" + entry['exc']
+    return text
+
+class LockedRotatingFileHandler(RotatingFileHandler):
+    """
+    RotatingFileHandler that serializes writes and rollovers across processes
+    with an flock on <file>.lock, and reopens the file when another process
+    has rotated it away.
+    """
+
+    def __init__(self, filename, max_bytes, backup_count):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+        self._lock_file = open(self.baseFilename + ".lock", 'a') if fcntl else None
+
+    def _reopen_if_rotated(self):
+        if self.stream is None:
+            return
+        try:
+            rotated = os.stat(self.baseFilename).st_ino != os.fstat(self.stream.fileno()).st_ino
+        except FileNotFoundError:
+            rotated = True
+        if rotated:
+            self.stream.close()
+            self.stream = None
+
+    def emit(self, record):
+        if self._lock_file is None:
+            return super().emit(record)
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                self._reopen_if_rotated()
+                super().emit(record)
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        super().close()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+def load_logging_config():
+    if os.path.exists(CONFIG_PATH):
+        with open(CONFIG_PATH, 'r') as f:
+            return (yaml.safe_load(f) or {}).get('logging', {})
+    return {}
+
+def setup_logging(stage, config=None):
+    """
+    Routes the root logger through a queue to a rotating JSON file and stdout.
+    Does nothing if logging is already configured (e.g. by a caller that
+    imports an agent), matching logging.basicConfig: records keep the stage
+    and campaign of whoever configured it, such as a worker.
+    """
+    global _listener, _rate_limiter
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    _context['stage'] = stage
+    _context['campaign'] = CURRENT.name
+
+    config = config if config is not None else load_logging_config()
+    log_file = config.get('log_file', DEFAULT_LOG_FILE)
+    if not os.path.isabs(log_file):
+        log_file = os.path.join(BASE_DIR, log_file)
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+
+    file_handler = LockedRotatingFileHandler(
+        log_file,
+        max_bytes=config.get('max_bytes', 10 * 1024 * 1024),
+        backup_count=config.get('backup_count', 5)
+    )
+    file_handler.setFormatter(JsonFormatter())
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(TextFormatter(TEXT_FORMAT))
+
+    rate_limit = config.get('rate_limit', {})
+    _rate_limiter = RateLimitFilter(rate_limit.get('burst', 20), rate_limit.get('interval', 60))
+
+    queue_handler = QueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(ContextFilter())
+    queue_handler.addFilter(_rate_limiter)
+    root.addHandler(queue_handler)
+    root.setLevel(config.get('level', 'INFO'))
+
+    _listener = QueueListener(queue_handler.queue, file_handler, console_handler)
+    _listener.start()
+    atexit.register(shutdown)
+
+def shutdown():
+    """Reports outstanding suppressed counts and flushes the queue."""
+    global _listener
+    if _listener is None:
+        return
+    for name, count in _rate_limiter.drain():
+        logging.getLogger(name).info(f"{count} identical messages suppressed")
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
@@ -0,0 +1,227 @@
+import os
+import ssl
+import time
+import uuid
+import sqlite3
+import smtplib
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import dns.resolver
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_PATH = os.path.join(BASE_DIR, "data/logs/mailbox_cache.db")
+
+# Verification outcomes
+VALID = 'valid'
+INVALID = 'invalid'
+CATCH_ALL = 'catch_all'   # Domain accepts any recipient: the mailbox cannot be confirmed
+UNKNOWN = 'unknown'       # No MX, connection trouble, 4xx or a policy block: not a reason to drop the address
+
+# 5xx replies that mean the mailbox does not exist; others (554 blocked, 530
+# auth required, ...) say nothing about the address
+NO_MAILBOX_CODES = (550, 551, 553)
+
+logger = logging.getLogger(__name__)
+
+def resolve_mx(domain):
+    """Returns the most preferred MX host of a domain, or None."""
+    try:
+        answers = dns.resolver.resolve(domain, 'MX')
+    except Exception:
+        return None
+    records = sorted(answers, key=lambda r: r.preference)
+    return str(records[0].exchange).rstrip('.') if records else None
+
+def _bad_mailbox(message):
+    """
+    True when an SMTP reply carries enhanced status 5.1.x (bad destination
+    mailbox/address), which names the address rather than the sender.
+    """
+    if isinstance(message, bytes):
+        message = message.decode('utf-8', 'replace')
+    return (message or '').lstrip().startswith('5.1.')
+
+class MailboxVerifier:
+    """
+    Checks whether mailboxes exist with SMTP RCPT TO, without sending mail.
+
+    Addresses are grouped by MX host and each host gets one connection that
+    probes all of its recipients, with at most `concurrency` hosts in flight.
+    Each domain is first probed with a random local part; if that is accepted
+    the domain is catch-all and its addresses are not probed individually.
+    Definitive results are cached in SQLite for cache_ttl_days.
+
+    host_override/port send every probe to one server instead of the MX,
+    e.g. a local SMTP stand-in for testing.
+    """
+
+    def __init__(self, mail_from, helo_host=None, concurrency=8, timeout=10.0,
+                 max_rcpt_per_session=50, cache_path=CACHE_PATH, cache_ttl_days=30,
+                 host_override=None, port=25, resolver=resolve_mx):
+        self.mail_from = mail_from
+        self.helo_host = helo_host
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_rcpt_per_session = max_rcpt_per_session
+        self.cache_ttl = cache_ttl_days * 86400
+        self.host_override = host_override
+        self.port = port
+        self.resolver = resolver
+
+        self.cache = None
+        if cache_path:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            self.cache = sqlite3.connect(cache_path, timeout=30)
+            self.cache.execute('''
+                CREATE TABLE IF NOT EXISTS mailbox_cache (
+                    email TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    checked_at REAL NOT NULL
+                )
+            ''')
+
+    @classmethod
+    def from_config(cls, validation_config):
+        return cls(
+            mail_from=validation_config.get('mail_from', ''),
+            helo_host=validation_config.get('helo_host') or None,
+            concurrency=validation_config.get('verify_concurrency', 8),
+            timeout=validation_config.get('verify_timeout', 10.0),
+            cache_ttl_days=validation_config.get('verify_cache_days', 30),
+            host_override=validation_config.get('smtp_host_override') or None,
+            port=validation_config.get('smtp_port', 25)
+        )
+
+    def close(self):
+        if self.cache is not None:
+            self.cache.close()
+
+    def _cached(self, emails):
+        if self.cache is None or not emails:
+            return {}
+        cutoff = time.time() - self.cache_ttl
+        found = {}
+        emails = list(emails)
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(emails), 500):
+            chunk = emails[start:start + 500]
+            rows = self.cache.execute(
+                f"SELECT email, status FROM mailbox_cache WHERE checked_at >= ? "
+                f"AND email IN ({','.join('?' * len(chunk))})",
+                [cutoff] + chunk
+            )
+            found.update(rows)
+        return found
+
+    def _store(self, results):
+        if self.cache is None:
+            return
+        now = time.time()
+        with self.cache:
+            self.cache.executemany(
+                'INSERT INTO mailbox_cache (email, status, checked_at) VALUES (?, ?, ?) '
+                'ON CONFLICT(email) DO UPDATE SET status = excluded.status, checked_at = excluded.checked_at',
+                ((email, status, now) for email, status in results.items() if status != UNKNOWN)
+            )
+
+    def verify(self, emails):
+        """
+        Returns {email: status} for the given addresses (lowercased).
+        """
+        emails = {e.lower().strip() for e in emails if '@' in e}
+        results = self._cached(emails)
+        pending = emails - results.keys()
+        if not pending:
+            return results
+
+        by_domain = defaultdict(list)
+        for email in pending:
+            by_domain[email.rpartition('@')[2]].append(email)
+
+        by_host = defaultdict(dict)
+        for domain, addresses in by_domain.items():
+            host = self.host_override or self.resolver(domain)
+            if host is None:
+                logger.info(f"No MX for {domain}; {len(addresses)} address(es) left unverified")
+                results.update((email, UNKNOWN) for email in addresses)
+                continue
+            by_host[host][domain] = addresses
+
+        logger.info(f"Verifying {len(pending)} mailboxes on {len(by_host)} mail hosts")
+        probed = {}
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for host_results in pool.map(lambda item: self._probe_host(*item), by_host.items()):
+                probed.update(host_results)
+
+        self._store(probed)
+        results.update(probed)
+        return results
+
+    def _open(self, host):
+        server = smtplib.SMTP(host, self.port, local_hostname=self.helo_host, timeout=self.timeout)
+        server.ehlo()
+        if server.has_extn('starttls'):
+            # Opportunistic, as between MTAs: many MX hosts use self-signed certificates
+            context = ssl.create_default_context()
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+            server.starttls(context=context)
+            server.ehlo()
+        return server
+
+    def _probe_host(self, host, domains):
+        """
+        Probes every address of the given domains over one connection to host.
+        """
+        results = {}
+        server = None
+        rcpt_in_session = 0
+
+        def rcpt(address):
+            nonlocal rcpt_in_session
+            # Servers limit recipients per transaction; start a new one well before that
+            if rcpt_in_session == 0 or rcpt_in_session >= self.max_rcpt_per_session:
+                if rcpt_in_session:
+                    server.rset()
+                code, _ = server.mail(self.mail_from)
+                if code != 250:
+                    raise smtplib.SMTPSenderRefused(code, b'', self.mail_from)
+                rcpt_in_session = 0
+            rcpt_in_session += 1
+            return server.rcpt(address)
+
+        try:
+            server = self._open(host)
+            for domain, addresses in domains.items():
+                probe = f"bbrc-probe-{uuid.uuid4().hex[:12]}@{domain}"
+                probe_code, _ = rcpt(probe)
+                if probe_code in (250, 251):
+                    results.update((email, CATCH_ALL) for email in addresses)
+                    continue
+                replies = {email: rcpt(email) for email in addresses}
+                # The probe and every real address refused alike: the server is
+                # refusing us (blocklist, policy), not reporting on mailboxes
+                refused_alike = all(code == probe_code for code, _ in replies.values())
+                for email, (code, message) in replies.items():
+                    if code in (250, 251):
+                        results[email] = VALID
+                    elif code in NO_MAILBOX_CODES and (not refused_alike or _bad_mailbox(message)):
+                        results[email] = INVALID
+                    else:
+                        results[email] = UNKNOWN
+        except (smtplib.SMTPException, OSError) as e:
+            logger.warning(f"Mailbox verification on {host} stopped: {e}")
+        finally:
+            if server is not None:
+                try:
+                    server.quit()
+                except Exception:
+                    pass
+
+        # Whatever the connection did not get to stays unverified
+        for addresses in domains.values():
+            for email in addresses:
+                results.setdefault(email, UNKNOWN)
+        return results
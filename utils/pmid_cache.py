@@ -0,0 +1,76 @@
+import os
+import json
+import time
+import sqlite3
+import datetime
+
+from utils.campaign import SHARED_DATA_DIR
+
+CACHE_PATH = os.path.join(SHARED_DATA_DIR, "pmid_cache.db")
+
+class PaperCache:
+    """
+    Parsed PubMed papers by PMID, and the day's esearch results by query,
+    shared by every campaign. Campaigns with overlapping keywords fetch each
+    paper once. Safe for concurrent processes (WAL, busy timeout).
+    """
+
+    def __init__(self, path=CACHE_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS papers (
+                pmid TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS searches (
+                key TEXT PRIMARY KEY,
+                ids TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            );
+        ''')
+
+    def close(self):
+        self.conn.close()
+
+    @staticmethod
+    def _search_key(query, days_back, max_results):
+        # The date window moves every day, so results are only reused on the same day
+        return json.dumps([datetime.date.today().isoformat(), query, days_back, max_results])
+
+    def get_search(self, query, days_back, max_results):
+        row = self.conn.execute(
+            'SELECT ids FROM searches WHERE key = ?', (self._search_key(query, days_back, max_results),)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_search(self, query, days_back, max_results, ids):
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO searches (key, ids, fetched_at) VALUES (?, ?, ?)',
+                (self._search_key(query, days_back, max_results), json.dumps(ids), time.time())
+            )
+            # Older days' searches are never read again
+            self.conn.execute('DELETE FROM searches WHERE fetched_at < ?', (time.time() - 2 * 86400,))
+
+    def get_many(self, pmids):
+        """Returns {pmid: paper} for the PMIDs that are cached."""
+        found = {}
+        pmids = [str(p) for p in pmids]
+        for start in range(0, len(pmids), 500):
+            chunk = pmids[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT pmid, payload FROM papers WHERE pmid IN ({','.join('?' * len(chunk))})", chunk
+            )
+            found.update((pmid, json.loads(payload)) for pmid, payload in rows)
+        return found
+
+    def put_many(self, papers):
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO papers (pmid, payload, fetched_at) VALUES (?, ?, ?)',
+                ((str(p['id']), json.dumps(p), now) for p in papers if p.get('id'))
+            )
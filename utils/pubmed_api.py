@@ -1,18 +1,133 @@
+import io
+import socket
+import random
 import logging
+import http.client
+import urllib.error
+from collections import deque
 from Bio import Entrez
 import json
 import time
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.rate_limiter import SharedRateLimiter, SharedCircuitBreaker
+
+# NCBI allows 3 requests/second without an API key
+REQUEST_INTERVAL = 0.34
+
+# fetch_mode values: efetch as PubMed XML, or as MEDLINE text, which carries
+# the same fields we keep without the XML markup and reference lists
+FULL = 'full'
+MEDLINE = 'medline'
+
+MONTHS = {'Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'}
+
+class EntrezUnavailable(Exception):
+    """Raised when an Entrez call still fails after all retries."""
+
+def _is_retryable(error):
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code == 429 or error.code >= 500
+    # URLError, timeouts, dropped connections, truncated bodies and the
+    # RuntimeErrors Entrez.read raises for NCBI backend error documents
+    return isinstance(error, (urllib.error.URLError, socket.timeout, ConnectionError,
+                              http.client.HTTPException, RuntimeError))
+
+def _to_plain(value):
+    """
+    Converts Entrez parser elements (str/list/dict subclasses carrying XML
+    attributes) into plain Python types so results can cross process boundaries.
+    """
+    if isinstance(value, dict):
+        return {k: _to_plain(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_to_plain(v) for v in value]
+    if isinstance(value, str):
+        return str(value)
+    return value
+
+def _parse_payload(payload):
+    """
+    Process-pool entry point: parses one raw efetch XML payload into paper dicts.
+    """
+    records = Entrez.read(io.BytesIO(payload))
+    papers = []
+    for article in records.get('PubmedArticle', []):
+        paper = parse_article(article, logging.getLogger(__name__))
+        if paper:
+            papers.append(_to_plain(paper))
+    return papers
 
 class PubMedAPI:
-    def __init__(self, email):
+    def __init__(self, email, parse_workers=0, batch_size=200, max_retries=5, backoff_base=1.0, backoff_max=60.0,
+                 fetch_mode=FULL, requests_per_second=None):
+        """
+        parse_workers > 0 parses efetch pages in a process pool while the
+        next page is being downloaded; 0 parses inline.
+        Transient NCBI errors (429, 5xx, network) are retried up to max_retries
+        times with exponential backoff and full jitter.
+
+        fetch_mode=MEDLINE fetches the trimmed MEDLINE text format instead of
+        XML and parses it inline; the papers are the same dicts.
+
+        requests_per_second paces every Entrez request through a limiter
+        shared by all processes on the shared data directory (queue workers,
+        concurrent campaigns), on top of the pause between batches. The
+        circuit breaker that pauses everyone while NCBI is degraded is
+        shared the same way.
+        """
+        if fetch_mode not in (FULL, MEDLINE):
+            raise ValueError(f"Unknown fetch_mode: {fetch_mode!r}")
         Entrez.email = email
         self.logger = logging.getLogger(__name__)
+        self.parse_workers = parse_workers
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.fetch_mode = fetch_mode
+        # Response bytes received from efetch, for run summaries
+        self.bytes_received = 0
+        self._pool = None
+        self.rate_limiter = SharedRateLimiter("ncbi", 1.0 / requests_per_second) if requests_per_second else None
+        self.breaker = SharedCircuitBreaker("ncbi")
 
-    def search_papers(self, query, days_back=7, max_results=100):
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self.rate_limiter is not None:
+            self.rate_limiter.close()
+            self.rate_limiter = None
+        self.breaker.close()
+
+    def _call(self, description, fn):
         """
-        Search PubMed for papers matching the query within the last N days.
+        Runs one Entrez request with retries, backoff and the shared circuit breaker.
         """
-        try:
+        for attempt in range(self.max_retries + 1):
+            self.breaker.wait()
+            if self.rate_limiter is not None:
+                self.rate_limiter.wait()
+            try:
+                result = fn()
+                self.breaker.success()
+                return result
+            except Exception as e:
+                if not _is_retryable(e):
+                    raise
+                self.breaker.failure()
+                if attempt == self.max_retries:
+                    raise EntrezUnavailable(f"{description} failed after {attempt + 1} attempts: {e}") from e
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                self.logger.warning(f"{description} failed ({e}); retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def search_ids(self, query, days_back=7, max_results=100):
+        """
+        PMIDs matching the query within the last N days. Raises on failure.
+        """
+        def esearch():
             # Calculate date range
             # Note: Entrez date format is YYYY/MM/DD
             # For simplicity in this initial version, we use 'reldate' parameter
@@ -24,14 +139,26 @@ class PubMedAPI:
                 datetype="pdat",
                 usehistory="y"
             )
-            record = Entrez.read(handle)
-            handle.close()
+            try:
+                return Entrez.read(handle)
+            finally:
+                handle.close()
+
+        record = self._call(f"esearch '{query}'", esearch)
+        return list(record["IdList"])
+
+    def search_papers(self, query, days_back=7, max_results=100):
+        """
+        Search PubMed for papers matching the query within the last N days.
+        """
+        try:
+            id_list = self.search_ids(query, days_back=days_back, max_results=max_results)
             
-            if not record["IdList"]:
+            if not id_list:
                 self.logger.info(f"No papers found for query: {query}")
                 return []
 
-            return self.fetch_details(record["IdList"])
+            return self.fetch_details(id_list)
 
         except Exception as e:
             self.logger.error(f"Error searching PubMed: {e}")
@@ -39,83 +166,232 @@ class PubMedAPI:
 
     def fetch_details(self, id_list):
         """
-        Fetch detailed metadata for a list of PubMed IDs.
+        Fetch detailed metadata for a list of PubMed IDs, batch_size IDs per request.
         """
         try:
-            ids = ",".join(id_list)
-            handle = Entrez.efetch(db="pubmed", id=ids, retmode="xml")
-            records = Entrez.read(handle)
-            handle.close()
-            
             papers = []
-            if 'PubmedArticle' not in records:
-                 return []
-
-            for article in records['PubmedArticle']:
-                paper = self._parse_article(article)
-                if paper:
-                    papers.append(paper)
-            
+            for _, batch in self.iter_batches(id_list):
+                papers.extend(batch)
             return papers
 
         except Exception as e:
             self.logger.error(f"Error fetching details: {e}")
             return []
 
+    def _efetch(self, ids):
+        def efetch():
+            handle = Entrez.efetch(db="pubmed", id=",".join(ids), retmode="xml")
+            try:
+                return handle.read()
+            finally:
+                handle.close()
+
+        payload = self._call(f"efetch of {len(ids)} PMIDs", efetch)
+        self.bytes_received += len(payload)
+        return payload
+
+    def _efetch_medline(self, ids):
+        def efetch():
+            handle = Entrez.efetch(db="pubmed", id=",".join(ids), rettype="medline", retmode="text")
+            try:
+                return handle.read()
+            finally:
+                handle.close()
+
+        payload = self._call(f"efetch of {len(ids)} PMIDs", efetch)
+        if isinstance(payload, bytes):
+            payload = payload.decode('utf-8')
+        self.bytes_received += len(payload.encode('utf-8'))
+        return payload
+
+    def _parse_inline(self, payload):
+        records = Entrez.read(io.BytesIO(payload))
+        papers = []
+        for article in records.get('PubmedArticle', []):
+            paper = self._parse_article(article)
+            if paper:
+                papers.append(paper)
+        return papers
+
+    def iter_batches(self, id_list, skip=()):
+        """
+        Yields (batch_index, papers) for each batch_size slice of id_list, in
+        order, skipping batch indexes in skip. Raises if a batch cannot be fetched.
+
+        With parse_workers > 0 the raw XML is parsed in the process pool while
+        the next batch downloads; batches already parsed are still yielded
+        before a fetch error is raised, so callers can checkpoint them.
+        """
+        batches = [
+            (index, id_list[start:start + self.batch_size])
+            for index, start in enumerate(range(0, len(id_list), self.batch_size))
+            if index not in skip
+        ]
+
+        if self.fetch_mode == MEDLINE:
+            # MEDLINE text parses fast enough that the process pool is not used
+            for n, (index, ids) in enumerate(batches):
+                if n:
+                    time.sleep(REQUEST_INTERVAL)
+                yield index, parse_medline(self._efetch_medline(ids), self.logger)
+            return
+
+        if self.parse_workers <= 0:
+            for n, (index, ids) in enumerate(batches):
+                if n:
+                    time.sleep(REQUEST_INTERVAL)
+                yield index, self._parse_inline(self._efetch(ids))
+            return
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.parse_workers)
+        pending = deque()
+        try:
+            for n, (index, ids) in enumerate(batches):
+                if n:
+                    time.sleep(REQUEST_INTERVAL)
+                pending.append((index, self._pool.submit(_parse_payload, self._efetch(ids))))
+                while pending and pending[0][1].done():
+                    done_index, future = pending.popleft()
+                    yield done_index, future.result()
+        except Exception:
+            while pending:
+                done_index, future = pending.popleft()
+                yield done_index, future.result()
+            raise
+        while pending:
+            done_index, future = pending.popleft()
+            yield done_index, future.result()
+
     def _parse_article(self, article):
         """
         Parse raw PubMed XML into a structured dictionary.
         """
+        return parse_article(article, self.logger)
+
+def parse_article(article, logger):
+    """
+    Parse one Entrez PubmedArticle record into a paper dict.
+    """
+    try:
+        medline = article['MedlineCitation']
+        article_data = medline['Article']
+        
+        # Extract basic info
+        pmid = str(medline['PMID'])
+        title = article_data.get('ArticleTitle', '')
+        journal = article_data.get('Journal', {}).get('Title', '')
+        
+        # Extract PubDate
+        pub_date_data = article_data.get('Journal', {}).get('JournalIssue', {}).get('PubDate', {})
+        pub_date = f"{pub_date_data.get('Year', '')}-{pub_date_data.get('Month', '')}-{pub_date_data.get('Day', '')}"
+
+        # Extract Authors
+        authors = []
+        if 'AuthorList' in article_data:
+            for a in article_data['AuthorList']:
+                if 'LastName' in a and 'ForeName' in a:
+                    author = {
+                        'first_name': a['ForeName'],
+                        'last_name': a['LastName'],
+                        'affiliation': [],
+                        'email': None
+                    }
+                    
+                    # Extract Affiliation info if available (often contains email)
+                    if 'AffiliationInfo' in a:
+                        for aff in a['AffiliationInfo']:
+                            if 'Affiliation' in aff:
+                                author['affiliation'].append(aff['Affiliation'])
+                    
+                    authors.append(author)
+
+        # DOI
+        doi = ""
+        if 'ELocationID' in article_data:
+            for eloc in article_data['ELocationID']:
+                if eloc.attributes.get('EIdType') == 'doi':
+                    doi = str(eloc)
+
+        return {
+            'id': pmid,
+            'title': title,
+            'journal': journal,
+            'pub_date': pub_date,
+            'doi': doi,
+            'authors': authors,
+            'source': 'pubmed'
+        }
+        
+    except Exception as e:
+        logger.warning(f"Error parsing article {article.get('MedlineCitation', {}).get('PMID', 'Unknown')}: {e}")
+        return None
+
+def _medline_records(text):
+    """Yields each record of a MEDLINE text response as a list of [tag, value]."""
+    fields = []
+    for line in text.splitlines():
+        if not line.strip():
+            if fields:
+                yield fields
+                fields = []
+        elif line[4:6] == '- ':
+            fields.append([line[:4].rstrip(), line[6:].strip()])
+        elif fields:
+            # Continuation lines are indented six spaces
+            fields[-1][1] += ' ' + line.strip()
+    if fields:
+        yield fields
+
+def _medline_date(value):
+    """'2024 Jan 15' -> '2024-Jan-15', the format parse_article produces."""
+    parts = value.split()
+    year = parts[0] if parts and parts[0].isdigit() else ''
+    month = parts[1] if len(parts) > 1 and parts[1] in MONTHS else ''
+    day = parts[2] if month and len(parts) > 2 and parts[2].isdigit() else ''
+    return f"{year}-{month}-{day}"
+
+def parse_medline_record(fields):
+    """
+    Converts one MEDLINE record into the paper dict parse_article produces.
+    Each AD line belongs to the FAU before it.
+    """
+    paper = {'id': '', 'title': '', 'journal': '', 'pub_date': '--', 'doi': '', 'authors': [], 'source': 'pubmed'}
+    author = None
+    for tag, value in fields:
+        if tag == 'PMID':
+            paper['id'] = value
+        elif tag == 'TI':
+            paper['title'] = value
+        elif tag == 'JT':
+            paper['journal'] = value
+        elif tag == 'DP':
+            paper['pub_date'] = _medline_date(value)
+        elif tag == 'LID' and value.endswith('[doi]'):
+            paper['doi'] = value[:-len('[doi]')].strip()
+        elif tag == 'FAU':
+            last_name, _, first_name = value.partition(', ')
+            author = {'first_name': first_name, 'last_name': last_name, 'affiliation': [], 'email': None}
+            # Like parse_article, only authors with both names are kept
+            if first_name and last_name:
+                paper['authors'].append(author)
+        elif tag == 'AD' and author is not None:
+            author['affiliation'].append(value)
+        elif tag == 'CN':
+            author = None
+    return paper if paper['id'] else None
+
+def parse_medline(text, logger):
+    """
+    Parses one efetch rettype=medline response into paper dicts, in response order.
+    """
+    papers = []
+    for fields in _medline_records(text):
         try:
-            medline = article['MedlineCitation']
-            article_data = medline['Article']
-            
-            # Extract basic info
-            pmid = str(medline['PMID'])
-            title = article_data.get('ArticleTitle', '')
-            journal = article_data.get('Journal', {}).get('Title', '')
-            
-            # Extract PubDate
-            pub_date_data = article_data.get('Journal', {}).get('JournalIssue', {}).get('PubDate', {})
-            pub_date = f"{pub_date_data.get('Year', '')}-{pub_date_data.get('Month', '')}-{pub_date_data.get('Day', '')}"
-
-            # Extract Authors
-            authors = []
-            if 'AuthorList' in article_data:
-                for a in article_data['AuthorList']:
-                    if 'LastName' in a and 'ForeName' in a:
-                        author = {
-                            'first_name': a['ForeName'],
-                            'last_name': a['LastName'],
-                            'affiliation': [],
-                            'email': None
-                        }
-                        
-                        # Extract Affiliation info if available (often contains email)
-                        if 'AffiliationInfo' in a:
-                            for aff in a['AffiliationInfo']:
-                                if 'Affiliation' in aff:
-                                    author['affiliation'].append(aff['Affiliation'])
-                        
-                        authors.append(author)
-
-            # DOI
-            doi = ""
-            if 'ELocationID' in article_data:
-                for eloc in article_data['ELocationID']:
-                    if eloc.attributes.get('EIdType') == 'doi':
-                        doi = str(eloc)
-
-            return {
-                'id': pmid,
-                'title': title,
-                'journal': journal,
-                'pub_date': pub_date,
-                'doi': doi,
-                'authors': authors,
-                'source': 'pubmed'
-            }
-            
+            paper = parse_medline_record(fields)
         except Exception as e:
-            self.logger.warning(f"Error parsing article {article.get('MedlineCitation', {}).get('PMID', 'Unknown')}: {e}")
-            return None
+            logger.warning(f"Error parsing MEDLINE record: {e}")
+            continue
+        if paper:
+            papers.append(paper)
+    return papers
@@ -0,0 +1,229 @@
+import os
+import re
+import gzip
+import json
+import glob
+import shutil
+import logging
+import datetime
+import tempfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+MONTHS = {m: i for i, m in enumerate(
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], start=1)}
+
+def find_dump_files(source_dir):
+    """
+    Baseline and update files in processing order (update files sort after baseline).
+    """
+    return sorted(glob.glob(os.path.join(source_dir, "pubmed*.xml.gz")))
+
+def _inner_xml(elem):
+    """
+    Element text including inline markup such as <i>, matching what
+    Entrez.read returns for ArticleTitle.
+    """
+    if elem is None:
+        return ''
+    parts = [elem.text or '']
+    for child in elem:
+        parts.append(f"<{child.tag}>{_inner_xml(child)}</{child.tag}>{child.tail or ''}")
+    return ''.join(parts)
+
+def _text(elem, path):
+    found = elem.find(path)
+    return (found.text or '') if found is not None else ''
+
+def _pub_date(pub_date_elem):
+    """
+    Returns (pub_date string as emitted by PubMedAPI, datetime.date or None).
+    """
+    if pub_date_elem is None:
+        return '--', None
+    year, month, day = _text(pub_date_elem, 'Year'), _text(pub_date_elem, 'Month'), _text(pub_date_elem, 'Day')
+    as_string = f"{year}-{month}-{day}"
+
+    if not year:
+        # e.g. <MedlineDate>2025 Jan-Feb</MedlineDate>
+        medline = _text(pub_date_elem, 'MedlineDate').split()
+        year = medline[0] if medline and medline[0].isdigit() else ''
+        month = medline[1][:3] if len(medline) > 1 else ''
+    if not year.isdigit():
+        return as_string, None
+    month_num = int(month) if month.isdigit() else MONTHS.get(month[:3].lower(), 1)
+    day_num = int(day) if day.isdigit() else 1
+    try:
+        return as_string, datetime.date(int(year), month_num, day_num)
+    except ValueError:
+        return as_string, datetime.date(int(year), 1, 1)
+
+def parse_article_element(elem):
+    """
+    Converts a <PubmedArticle> element into the same dict PubMedAPI._parse_article
+    emits, plus the searchable text (title, abstract, MeSH, keywords) and the
+    publication date used for filtering.
+    """
+    medline = elem.find('MedlineCitation')
+    article = medline.find('Article')
+    journal = article.find('Journal')
+
+    title = _inner_xml(article.find('ArticleTitle'))
+    pub_date, published = _pub_date(journal.find('JournalIssue/PubDate') if journal is not None else None)
+
+    authors = []
+    for a in article.iterfind('AuthorList/Author'):
+        last, fore = a.find('LastName'), a.find('ForeName')
+        if last is None or fore is None:
+            continue
+        authors.append({
+            'first_name': fore.text or '',
+            'last_name': last.text or '',
+            'affiliation': [_inner_xml(aff) for aff in a.iterfind('AffiliationInfo/Affiliation')],
+            'email': None
+        })
+
+    doi = ""
+    for eloc in article.iterfind('ELocationID'):
+        if eloc.get('EIdType') == 'doi':
+            doi = eloc.text or ''
+
+    searchable = ' '.join([title] + [
+        ''.join(node.itertext()) for node in (
+            list(article.iterfind('Abstract/AbstractText'))
+            + list(medline.iterfind('MeshHeadingList/MeshHeading/DescriptorName'))
+            + list(medline.iterfind('KeywordList/Keyword'))
+        )
+    ])
+
+    paper = {
+        'id': medline.findtext('PMID', ''),
+        'title': title,
+        'journal': _text(journal, 'Title') if journal is not None else '',
+        'pub_date': pub_date,
+        'doi': doi,
+        'authors': authors,
+        'source': 'pubmed'
+    }
+    return paper, searchable, published
+
+def iter_dump(path):
+    """
+    Streams one pubmed*.xml.gz file in document order as (pmid, record)
+    pairs: record is (paper, searchable_text, published_date) for an article
+    and None for a PMID listed under <DeleteCitation>. Parsed elements are
+    cleared so memory stays flat regardless of file size.
+    """
+    with gzip.open(path, 'rb') as f:
+        context = ET.iterparse(f, events=('start', 'end'))
+        _, root = next(context)
+        for event, elem in context:
+            if event != 'end':
+                continue
+            if elem.tag == 'PubmedArticle':
+                try:
+                    record = parse_article_element(elem)
+                    yield record[0]['id'], record
+                except Exception as e:
+                    logger.warning(f"Error parsing article in {path}: {e}")
+                root.clear()
+            elif elem.tag == 'DeleteCitation':
+                for pmid in elem.iterfind('PMID'):
+                    yield (pmid.text or '').strip(), None
+                root.clear()
+
+def _process_file(args):
+    """
+    Worker: filters one dump file. Only the last occurrence of a PMID in the
+    file counts. Writes the matching papers to a part file as "pmid<TAB>json"
+    lines, and the PMIDs whose last occurrence was filtered out or deleted to
+    a .dropped file, one per line, so they can supersede older files.
+    """
+    path, keywords, date_from, date_to, part_dir = args
+    pattern = re.compile('|'.join(re.escape(k) for k in keywords), re.IGNORECASE) if keywords else None
+    # PMID -> matching paper, or None when its last revision here did not match or was deleted
+    latest = {}
+    scanned = 0
+    for pmid, record in iter_dump(path):
+        if record is None:
+            latest[pmid] = None
+            continue
+        scanned += 1
+        paper, searchable, published = record
+        latest[pmid] = paper if _matches(searchable, published, pattern, date_from, date_to) else None
+
+    part_path = os.path.join(part_dir, os.path.basename(path) + ".jsonl")
+    dropped_path = os.path.join(part_dir, os.path.basename(path) + ".dropped")
+    matched = 0
+    with open(part_path, 'w') as out, open(dropped_path, 'w') as dropped:
+        for pmid, paper in latest.items():
+            if paper is None:
+                dropped.write(pmid + "\n")
+            else:
+                out.write(pmid + "\t" + json.dumps(paper) + "\n")
+                matched += 1
+    return path, part_path, dropped_path, scanned, matched
+
+def _matches(searchable, published, pattern, date_from, date_to):
+    if date_from or date_to:
+        if published is None:
+            return False
+        if date_from and published < date_from:
+            return False
+        if date_to and published > date_to:
+            return False
+    return not pattern or bool(pattern.search(searchable))
+
+def import_dumps(paths, keywords, output_file, date_from=None, date_to=None, workers=None):
+    """
+    Filters PubMed baseline/update dumps against keywords and a publication
+    date window, in parallel across files, and writes a papers JSON file in the
+    same format as the discovery agent. Returns the number of papers written.
+
+    Each PMID is judged by its latest revision: a later file (or a later
+    record in the same file) replaces earlier ones, and a PMID whose latest
+    revision no longer matches or that an update file deletes is left out.
+    """
+    part_dir = tempfile.mkdtemp(prefix="pubmed_bulk_", dir=os.path.dirname(os.path.abspath(output_file)))
+    tmp_file = output_file + ".tmp"
+    try:
+        jobs = [(p, keywords, date_from, date_to, part_dir) for p in paths]
+        parts = {}
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for path, part_path, dropped_path, scanned, matched in pool.map(_process_file, jobs):
+                logger.info(f"{os.path.basename(path)}: {matched}/{scanned} articles matched")
+                parts[path] = (part_path, dropped_path)
+
+        # Oldest file first: PMID -> index of the file holding its latest matching revision
+        latest = {}
+        for index, path in enumerate(paths):
+            part_path, dropped_path = parts[path]
+            with open(dropped_path, 'r') as dropped:
+                for line in dropped:
+                    latest.pop(line.rstrip("\n"), None)
+            with open(part_path, 'r') as part:
+                for line in part:
+                    latest[line.partition("\t")[0]] = index
+
+        written = 0
+        with open(tmp_file, 'w') as out:
+            out.write("[")
+            for index, path in enumerate(paths):
+                with open(parts[path][0], 'r') as part:
+                    for line in part:
+                        pmid, _, paper = line.rstrip("\n").partition("\t")
+                        if latest.get(pmid) != index:
+                            continue
+                        out.write(("," if written else "") + "\n" + paper)
+                        written += 1
+            out.write("\n]\n")
+        os.replace(tmp_file, output_file)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+    finally:
+        shutil.rmtree(part_dir, ignore_errors=True)
+    return written
@@ -0,0 +1,135 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+
+from utils.campaign import SHARED_DATA_DIR
+
+RATE_PATH = os.path.join(SHARED_DATA_DIR, "rate_limits.db")
+
+def _connect(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS slots (
+            name TEXT PRIMARY KEY,
+            next_at REAL NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS breakers (
+            name TEXT PRIMARY KEY,
+            failures INTEGER NOT NULL,
+            open_until REAL NOT NULL
+        )
+    ''')
+    return conn
+
+class SharedRateLimiter:
+    """
+    Spaces requests to one service at least `interval` seconds apart across
+    every thread and process that opens the same database, so any number of
+    queue workers and campaigns together stay within e.g. NCBI's 3 requests
+    per second. Each wait() reserves the next free slot in an IMMEDIATE
+    transaction and then sleeps until it comes up.
+    """
+
+    def __init__(self, name, interval, path=RATE_PATH, clock=time.time, sleep=time.sleep):
+        self.name = name
+        self.interval = interval
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.conn = _connect(path)
+
+    def reserve(self):
+        """Claims the next free slot and returns its start time."""
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self.conn.execute('SELECT next_at FROM slots WHERE name = ?', (self.name,)).fetchone()
+                start = max(self.clock(), row[0] if row else 0.0)
+                self.conn.execute(
+                    'INSERT INTO slots (name, next_at) VALUES (?, ?) '
+                    'ON CONFLICT(name) DO UPDATE SET next_at = excluded.next_at',
+                    (self.name, start + self.interval)
+                )
+                self.conn.execute('COMMIT')
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+        return start
+
+    def wait(self):
+        delay = self.reserve() - self.clock()
+        if delay > 0:
+            self.sleep(delay)
+
+    def close(self):
+        self.conn.close()
+
+class SharedCircuitBreaker:
+    """
+    A circuit breaker for one service kept in the same database as the rate
+    limiter: after failure_threshold consecutive failures, counted across
+    every process, all callers pause for cooldown seconds instead of
+    hammering a degraded service.
+    """
+
+    def __init__(self, name, failure_threshold=5, cooldown=60.0, path=RATE_PATH,
+                 clock=time.time, sleep=time.sleep):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+        self.conn = _connect(path)
+
+    def _state(self):
+        row = self.conn.execute('SELECT failures, open_until FROM breakers WHERE name = ?', (self.name,)).fetchone()
+        return row if row else (0, 0.0)
+
+    def wait(self):
+        while True:
+            with self.lock:
+                remaining = self._state()[1] - self.clock()
+            if remaining <= 0:
+                return
+            self.sleep(remaining)
+
+    def success(self):
+        with self.lock:
+            # A read, not a write, on the common path
+            if self._state()[0]:
+                self.conn.execute('UPDATE breakers SET failures = 0 WHERE name = ?', (self.name,))
+
+    def failure(self):
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                failures, open_until = self._state()
+                failures += 1
+                now = self.clock()
+                opened = failures >= self.failure_threshold and now >= open_until
+                if opened:
+                    open_until = now + self.cooldown
+                self.conn.execute(
+                    'INSERT INTO breakers (name, failures, open_until) VALUES (?, ?, ?) '
+                    'ON CONFLICT(name) DO UPDATE SET failures = excluded.failures, open_until = excluded.open_until',
+                    (self.name, failures, open_until)
+                )
+                self.conn.execute('COMMIT')
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+        if opened:
+            self.logger.warning(
+                f"{self.name} degraded ({failures} consecutive failures); pausing requests for {self.cooldown}s"
+            )
+
+    def close(self):
+        self.conn.close()
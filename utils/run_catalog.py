@@ -0,0 +1,211 @@
+import sqlite3
+import os
+import json
+import time
+import glob
+import datetime
+import logging
+
+from utils.campaign import DATA_DIR
+
+CATALOG_PATH = os.path.join(DATA_DIR, "runs.db")
+RAW_PAPERS_DIR = os.path.join(DATA_DIR, "raw_papers")
+# Written by earlier versions; imported into archived_papers on first compaction
+ARCHIVE_FILE = "papers_archive.json"
+
+# Runs whose artifact is usable downstream: an incomplete discovery run still
+# saved the papers of every keyword that finished
+OUTPUT_STATUSES = "('completed', 'incomplete')"
+
+logger = logging.getLogger(__name__)
+
+def get_connection():
+    os.makedirs(os.path.dirname(CATALOG_PATH), exist_ok=True)
+    conn = sqlite3.connect(CATALOG_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS runs (
+            run_id TEXT PRIMARY KEY,
+            stage TEXT NOT NULL,
+            status TEXT NOT NULL,
+            artifact_path TEXT,
+            record_count INTEGER,
+            keywords TEXT,
+            started_at REAL NOT NULL,
+            finished_at REAL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_runs_stage_finished ON runs(stage, status, finished_at)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS archived_papers (
+            id TEXT PRIMARY KEY,
+            run_id TEXT,
+            paper TEXT NOT NULL
+        )
+    ''')
+    return conn
+
+def _pid_alive(pid):
+    if os.name != 'posix':
+        # os.kill would terminate the process on Windows; assume it is alive
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _fail_stale_runs(conn):
+    """
+    Marks runs left 'running' by a process that no longer exists (killed or
+    crashed before finish_run) as failed.
+    """
+    stale = []
+    for row in conn.execute("SELECT run_id FROM runs WHERE status = 'running'"):
+        pid = row['run_id'].rpartition('_')[2]
+        if pid.isdigit() and not _pid_alive(int(pid)):
+            stale.append(row['run_id'])
+    if stale:
+        conn.executemany(
+            "UPDATE runs SET status = 'failed', finished_at = ? WHERE run_id = ? AND status = 'running'",
+            ((time.time(), run_id) for run_id in stale)
+        )
+        logger.warning(f"Marked {len(stale)} interrupted runs as failed: {', '.join(stale)}")
+
+def start_run(stage, keywords=None):
+    """
+    Registers a new run for a pipeline stage and returns its run ID.
+    """
+    run_id = "{}_{}_{}".format(stage, datetime.datetime.now().strftime("%Y%m%d_%H%M%S"), os.getpid())
+    conn = get_connection()
+    with conn:
+        _fail_stale_runs(conn)
+        conn.execute(
+            'INSERT INTO runs (run_id, stage, status, keywords, started_at) VALUES (?, ?, ?, ?, ?)',
+            (run_id, stage, 'running', json.dumps(keywords) if keywords is not None else None, time.time())
+        )
+    conn.close()
+    return run_id
+
+def finish_run(run_id, artifact_path=None, record_count=None, status='completed'):
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            'UPDATE runs SET status = ?, artifact_path = ?, record_count = ?, finished_at = ? WHERE run_id = ?',
+            (status, os.path.abspath(artifact_path) if artifact_path else None, record_count, time.time(), run_id)
+        )
+    conn.close()
+
+def latest_run(stage):
+    """
+    Most recent completed or incomplete run of a stage (an index lookup, not
+    a directory scan). Check its status to tell the two apart.
+    """
+    query = f"SELECT * FROM runs WHERE stage = ? AND status IN {OUTPUT_STATUSES} ORDER BY finished_at DESC LIMIT 1"
+    conn = get_connection()
+    row = conn.execute(query, (stage,)).fetchone()
+    if row is None and stage == 'discovery':
+        # First use on a tree that predates the catalog
+        _import_legacy_snapshots(conn)
+        row = conn.execute(query, (stage,)).fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+def latest_artifact(stage):
+    run = latest_run(stage)
+    if run and run['artifact_path'] and os.path.exists(run['artifact_path']):
+        return run['artifact_path']
+    return None
+
+def _import_legacy_snapshots(conn):
+    files = [f for f in glob.glob(os.path.join(RAW_PAPERS_DIR, "papers_*.json"))
+             if os.path.basename(f) != ARCHIVE_FILE]
+    with conn:
+        for path in files:
+            mtime = os.path.getmtime(path)
+            conn.execute(
+                'INSERT OR IGNORE INTO runs (run_id, stage, status, artifact_path, started_at, finished_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                ("legacy_" + os.path.basename(path), 'discovery', 'completed', os.path.abspath(path), mtime, mtime)
+            )
+    if files:
+        logger.info(f"Registered {len(files)} legacy paper snapshots in the run catalog")
+
+def compact_snapshots(keep_runs=10):
+    """
+    Keeps the newest keep_runs discovery snapshots, incomplete runs included,
+    and moves the papers of older ones into the archived_papers table (first
+    copy of each id wins), so data/raw_papers stays bounded. The archive is
+    only ever appended to.
+    """
+    conn = get_connection()
+    _import_legacy_archive(conn)
+    old_runs = conn.execute(
+        f"SELECT run_id, artifact_path FROM runs WHERE stage = 'discovery' AND status IN {OUTPUT_STATUSES} "
+        "ORDER BY finished_at DESC LIMIT -1 OFFSET ?",
+        (keep_runs,)
+    ).fetchall()
+    if not old_runs:
+        conn.close()
+        return 0
+    kept_paths = {r['artifact_path'] for r in conn.execute(
+        f"SELECT artifact_path FROM runs WHERE stage = 'discovery' AND status IN {OUTPUT_STATUSES} "
+        "ORDER BY finished_at DESC LIMIT ?",
+        (keep_runs,)
+    )}
+
+    archived = 0
+    with conn:
+        for run in old_runs:
+            path = run['artifact_path']
+            if path and os.path.exists(path):
+                with open(path, 'r') as f:
+                    papers = json.load(f)
+                before = conn.total_changes
+                conn.executemany(
+                    'INSERT OR IGNORE INTO archived_papers (id, run_id, paper) VALUES (?, ?, ?)',
+                    ((str(paper['id']), run['run_id'], json.dumps(paper)) for paper in papers)
+                )
+                archived += conn.total_changes - before
+            conn.execute(
+                "UPDATE runs SET status = 'compacted', artifact_path = NULL WHERE run_id = ?", (run['run_id'],)
+            )
+
+    # Only once the archive rows are committed
+    for run in old_runs:
+        path = run['artifact_path']
+        if path and path not in kept_paths and os.path.exists(path):
+            os.remove(path)
+    conn.close()
+    logger.info(f"Compacted {len(old_runs)} paper snapshots into the run catalog ({archived} new papers archived)")
+    return len(old_runs)
+
+def _import_legacy_archive(conn):
+    path = os.path.join(RAW_PAPERS_DIR, ARCHIVE_FILE)
+    if not os.path.exists(path):
+        return
+    with open(path, 'r') as f:
+        papers = json.load(f)
+    with conn:
+        conn.executemany(
+            'INSERT OR IGNORE INTO archived_papers (id, paper) VALUES (?, ?)',
+            ((str(paper['id']), json.dumps(paper)) for paper in papers)
+        )
+        conn.execute(
+            "UPDATE runs SET artifact_path = NULL WHERE status = 'compacted' AND artifact_path = ?",
+            (os.path.abspath(path),)
+        )
+    os.remove(path)
+    logger.info(f"Moved {len(papers)} papers from {path} into the run catalog")
+
+def iter_archived_papers():
+    """Yields every archived paper."""
+    conn = get_connection()
+    try:
+        for row in conn.execute('SELECT paper FROM archived_papers'):
+            yield json.loads(row['paper'])
+    finally:
+        conn.close()
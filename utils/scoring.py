@@ -0,0 +1,134 @@
+import os
+import re
+import logging
+import datetime
+import numpy as np
+import pandas as pd
+
+from utils.campaign import DATA_DIR
+
+ENGAGEMENT_FILE = os.path.join(DATA_DIR, "logs/engagement.csv")
+
+DEFAULT_WEIGHTS = {
+    'keyword': 1.0,
+    'journal': 0.5,
+    'position': 0.75,
+    'recency': 1.0,
+    'engagement': 0.5
+}
+
+MONTHS = {m: i for i, m in enumerate(
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], start=1)}
+
+logger = logging.getLogger(__name__)
+
+def load_domain_engagement(path=ENGAGEMENT_FILE):
+    """
+    Counts past engagement events (replies, submissions, ...) per email domain.
+    The file is a CSV with at least an 'email' column; missing file means no signal.
+    """
+    if not os.path.exists(path):
+        return {}
+    events = pd.read_csv(path, usecols=['email'], dtype=str)
+    domains = events['email'].str.lower().str.rsplit('@', n=1).str[-1]
+    return domains.value_counts().to_dict()
+
+def _per_distinct(values, fn):
+    """
+    Applies a vectorized fn to the distinct values of a column only and
+    broadcasts the result back. Paper-level fields (title, journal, date) are
+    shared by every author of a paper, so this cuts the string work several-fold.
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    return np.asarray(fn(pd.Series(uniques, dtype=object)), dtype=float)[codes]
+
+def _parse_pub_dates(pub_dates):
+    """
+    Vectorized parse of PubMed 'YYYY-Mon-DD' dates; missing month/day default to 1.
+    """
+    parts = pub_dates.fillna('').str.split('-', n=2, expand=True).reindex(columns=[0, 1, 2])
+    year = pd.to_numeric(parts[0], errors='coerce')
+    month_text = parts[1].fillna('').str.lower().str[:3]
+    month = pd.to_numeric(parts[1], errors='coerce').fillna(month_text.map(MONTHS)).fillna(1)
+    day = pd.to_numeric(parts[2], errors='coerce').fillna(1)
+    return pd.to_datetime(
+        pd.DataFrame({'year': year, 'month': month.clip(1, 12), 'day': day.clip(1, 28)}),
+        errors='coerce'
+    )
+
+def score_candidates(candidates, keywords, scoring_config=None, engagement=None, today=None):
+    """
+    Builds a columnar table from the candidate dicts and returns a numpy array
+    of relevance scores, computed without a per-record Python loop.
+    """
+    scoring_config = scoring_config or {}
+    weights = dict(DEFAULT_WEIGHTS, **scoring_config.get('weights', {}))
+    journal_weights = {k.lower(): v for k, v in scoring_config.get('journal_weights', {}).items()}
+    half_life = scoring_config.get('recency_half_life_days', 90)
+    engagement = engagement or {}
+
+    df = pd.DataFrame.from_records(
+        candidates, columns=['email', 'paper_title', 'journal', 'pub_date', 'author_position', 'author_count']
+    )
+    if df.empty:
+        return np.zeros(0)
+
+    # Keyword match: number of configured keywords in the title, saturating at 3
+    if keywords:
+        pattern = re.compile('|'.join(re.escape(k.lower()) for k in keywords))
+        keyword_score = _per_distinct(
+            df['paper_title'],
+            lambda titles: np.minimum(titles.fillna('').str.lower().str.count(pattern), 3) / 3.0
+        )
+    else:
+        keyword_score = np.zeros(len(df))
+
+    # Journal: configured preference per journal, neutral otherwise
+    journal_score = _per_distinct(
+        df['journal'],
+        lambda journals: journals.fillna('').str.lower().map(journal_weights).fillna(0.5)
+    )
+
+    # Author position: first and last (corresponding/PI) authors are the best targets
+    position = pd.to_numeric(df['author_position'], errors='coerce').to_numpy(dtype=float)
+    count = pd.to_numeric(df['author_count'], errors='coerce').to_numpy(dtype=float)
+    position_score = np.where(
+        np.isnan(position), 0.5,
+        np.where((position == 1) | (position == count), 1.0, 0.3)
+    )
+
+    # Recency: exponential decay by publication age
+    today = pd.Timestamp(today or datetime.date.today())
+    age_days = _per_distinct(df['pub_date'], lambda dates: (today - _parse_pub_dates(dates)).dt.days)
+    recency_score = np.where(np.isnan(age_days), 0.25, np.exp2(-np.clip(age_days, 0, None) / half_life))
+
+    # Past engagement of the recipient's institution
+    if engagement:
+        # str.rpartition on the raw list is ~5x faster than the object-dtype .str accessor
+        domains = pd.Series([e.rpartition('@')[2].lower() for e in df['email'].fillna('').tolist()])
+        events = domains.map(engagement).fillna(0).to_numpy(dtype=float)
+        engagement_score = np.log1p(events) / np.log1p(max(engagement.values()))
+    else:
+        engagement_score = np.zeros(len(df))
+
+    return (
+        weights['keyword'] * keyword_score
+        + weights['journal'] * journal_score
+        + weights['position'] * position_score
+        + weights['recency'] * recency_score
+        + weights['engagement'] * engagement_score
+    )
+
+def rank_candidates(candidates, keywords, scoring_config=None, engagement=None):
+    """
+    Returns the candidates sorted by descending score, each with a 'score' field.
+    Ties keep their original order.
+    """
+    if not candidates:
+        return []
+    scores = score_candidates(candidates, keywords, scoring_config, engagement)
+    order = np.argsort(-scores, kind='stable')
+    ranked = [candidates[i] for i in order.tolist()]
+    for candidate, score in zip(ranked, np.round(scores[order], 4).tolist()):
+        candidate['score'] = score
+    return ranked
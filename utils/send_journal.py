@@ -0,0 +1,223 @@
+import sqlite3
+import os
+import json
+import time
+import logging
+import threading
+
+from utils.campaign import DATA_DIR
+from utils.send_scheduler import REJECTED, RELAY_ERROR, UNKNOWN as DELIVERY_UNKNOWN
+
+JOURNAL_PATH = os.path.join(DATA_DIR, "logs/send_journal.db")
+
+QUEUED = 'queued'
+# Picked for the current batch, but its SMTP transaction has not started
+CLAIMED = 'claimed'
+SENDING = 'sending'
+SENT = 'sent'
+FAILED = 'failed'
+# Was in flight when the process died: it may or may not have been delivered,
+# so it is never retried automatically.
+UNKNOWN = 'unknown'
+
+logger = logging.getLogger(__name__)
+
+class SendJournal:
+    """
+    Durable per-recipient send state for outreach campaigns.
+    A recipient is marked 'sending' durably just before its SMTP transaction
+    starts and its outcome is committed as soon as it is known, so a crash
+    can never cause a second send and leaves at most the sends that were
+    actually in flight in doubt.
+
+    start, retry_later and complete may be called from the scheduler's
+    relay threads.
+    """
+
+    def __init__(self, path=JOURNAL_PATH, max_retries=3, retry_delay=3600.0):
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.execute('PRAGMA synchronous = FULL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS sends (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                email TEXT NOT NULL UNIQUE,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                payload TEXT NOT NULL,
+                last_error TEXT,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS sources (
+                path TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL
+            );
+        ''')
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(sends)')}
+        if 'score' not in columns:
+            self.conn.execute('ALTER TABLE sends ADD COLUMN score REAL NOT NULL DEFAULT 0')
+        if 'next_attempt_at' not in columns:
+            self.conn.execute('ALTER TABLE sends ADD COLUMN next_attempt_at REAL NOT NULL DEFAULT 0')
+        self.conn.execute('DROP INDEX IF EXISTS idx_sends_state')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_sends_state_score ON sends(state, score DESC, seq)')
+
+    def close(self):
+        self.conn.close()
+
+    def recover_in_flight(self):
+        """
+        Cleans up after a crashed run: claimed recipients that were never
+        attempted go back to the queue, and those left in 'sending' are marked
+        'unknown'. Returns (requeued, unknown).
+        """
+        now = time.time()
+        with self.conn:
+            requeued = self.conn.execute(
+                'UPDATE sends SET state = ?, updated_at = ? WHERE state = ?', (QUEUED, now, CLAIMED)
+            ).rowcount
+            unknown = self.conn.execute(
+                'UPDATE sends SET state = ?, updated_at = ? WHERE state = ?', (UNKNOWN, now, SENDING)
+            ).rowcount
+        return requeued, unknown
+
+    def enqueue(self, candidates):
+        """
+        Queues candidates that have never been journaled. Returns the number added.
+        """
+        now = time.time()
+        with self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO sends (email, state, score, payload, updated_at) VALUES (?, ?, ?, ?, ?)',
+                ((c['email'], QUEUED, c.get('score') or 0, json.dumps(c), now)
+                 for c in candidates if c.get('email'))
+            )
+            return self.conn.total_changes - before
+
+    def enqueue_file(self, path, loader):
+        """
+        Enqueues the candidates in path, but only when the file changed since
+        it was last enqueued, so a restart does not re-scan the whole list.
+        """
+        if not os.path.exists(path):
+            return 0
+        stat = os.stat(path)
+        fingerprint = f"{stat.st_size}:{stat.st_mtime_ns}"
+        row = self.conn.execute('SELECT fingerprint FROM sources WHERE path = ?', (path,)).fetchone()
+        if row and row[0] == fingerprint:
+            return 0
+
+        added = self.enqueue(loader())
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO sources (path, fingerprint) VALUES (?, ?)', (path, fingerprint)
+            )
+        return added
+
+    def claim(self, limit):
+        """
+        Moves up to limit queued recipients that are due to 'claimed', best
+        score first, and returns their payloads.
+        """
+        with self.conn:
+            rows = self.conn.execute(
+                'SELECT seq, payload FROM sends WHERE state = ? AND next_attempt_at <= ? '
+                'ORDER BY score DESC, seq LIMIT ?',
+                (QUEUED, time.time(), limit)
+            ).fetchall()
+            self.conn.executemany(
+                'UPDATE sends SET state = ?, updated_at = ? WHERE seq = ?',
+                ((CLAIMED, time.time(), seq) for seq, _ in rows)
+            )
+        return [json.loads(payload) for _, payload in rows]
+
+    def start(self, emails):
+        """
+        Marks claimed recipients as 'sending'. Committed before the SMTP
+        transaction begins, so a crash from here on leaves them 'unknown'.
+        """
+        with self.lock, self.conn:
+            self.conn.executemany(
+                'UPDATE sends SET state = ?, updated_at = ? WHERE email = ? AND state = ?',
+                ((SENDING, time.time(), e, CLAIMED) for e in emails)
+            )
+
+    def retry_later(self, email):
+        """
+        Moves a deferred recipient back to 'claimed': the server turned the
+        message away, so nothing is in flight until it is started again.
+        """
+        with self.lock, self.conn:
+            self.conn.execute(
+                'UPDATE sends SET state = ?, updated_at = ? WHERE email = ? AND state = ?',
+                (CLAIMED, time.time(), email, SENDING)
+            )
+
+    def complete(self, results):
+        """
+        Records the outcome of claimed sends: an iterable of
+        (email, success, error, outcome) with the scheduler's outcome.
+        A permanent rejection fails the recipient at once, and a connection
+        lost after DATA leaves it 'unknown', like a crash. Other failures go
+        back to the queue, not before retry_delay, so a run never picks up
+        again what failed in it; they count towards max_retries unless the
+        relay or account was at fault rather than the recipient.
+        """
+        now = time.time()
+        with self.lock, self.conn:
+            for email, success, error, outcome in results:
+                if success:
+                    self.conn.execute(
+                        'UPDATE sends SET state = ?, attempts = attempts + 1, last_error = NULL, updated_at = ? '
+                        'WHERE email = ?',
+                        (SENT, now, email)
+                    )
+                elif outcome == REJECTED:
+                    self.conn.execute(
+                        'UPDATE sends SET state = ?, attempts = attempts + 1, last_error = ?, updated_at = ? '
+                        'WHERE email = ?',
+                        (FAILED, error, now, email)
+                    )
+                elif outcome == DELIVERY_UNKNOWN:
+                    self.conn.execute(
+                        'UPDATE sends SET state = ?, attempts = attempts + 1, last_error = ?, updated_at = ? '
+                        'WHERE email = ?',
+                        (UNKNOWN, error, now, email)
+                    )
+                elif outcome == RELAY_ERROR:
+                    self.conn.execute(
+                        'UPDATE sends SET state = ?, last_error = ?, next_attempt_at = ?, updated_at = ? '
+                        'WHERE email = ?',
+                        (QUEUED, error, now + self.retry_delay, now, email)
+                    )
+                else:
+                    self.conn.execute(
+                        'UPDATE sends SET state = CASE WHEN attempts + 1 >= ? THEN ? ELSE ? END, '
+                        'attempts = attempts + 1, last_error = ?, next_attempt_at = ?, updated_at = ? '
+                        'WHERE email = ?',
+                        (self.max_retries, FAILED, QUEUED, error, now + self.retry_delay, now, email)
+                    )
+
+    def release(self, emails, started=False):
+        """
+        Returns claimed but never attempted recipients to the queue. Rows
+        already 'sending' are left alone unless started is set, for callers
+        that know the send never began (e.g. a cancelled queue task).
+        """
+        states = (CLAIMED, SENDING if started else CLAIMED)
+        with self.lock, self.conn:
+            self.conn.executemany(
+                'UPDATE sends SET state = ?, updated_at = ? WHERE email = ? AND state IN (?, ?)',
+                ((QUEUED, time.time(), e, *states) for e in emails)
+            )
+
+    def counts(self):
+        rows = self.conn.execute('SELECT state, count(*) FROM sends GROUP BY state').fetchall()
+        return dict(rows)
+
+    def pending_count(self):
+        return self.conn.execute('SELECT count(*) FROM sends WHERE state = ?', (QUEUED,)).fetchone()[0]
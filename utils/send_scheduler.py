@@ -0,0 +1,365 @@
+import os
+import time
+import heapq
+import smtplib
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Outcomes of a single delivery attempt
+ACCEPTED = 'accepted'
+DEFERRED = 'deferred'   # 4xx / connection trouble: try again later
+REJECTED = 'rejected'   # 5xx: permanent failure
+RELAY_ERROR = 'relay_error'  # 5xx login/sender/greeting: the relay or account, not the recipient
+UNKNOWN = 'unknown'     # connection lost after DATA: the message may have been delivered
+ERROR = 'error'         # the message could not be built or encoded for this recipient
+
+class DeliveryUnknown(Exception):
+    """The connection dropped after the DATA command went out."""
+
+class _TrackData:
+    data_started = False
+
+    def data(self, msg):
+        self.data_started = True
+        return super().data(msg)
+
+class _SMTP(_TrackData, smtplib.SMTP):
+    pass
+
+class _SMTP_SSL(_TrackData, smtplib.SMTP_SSL):
+    pass
+
+class Relay:
+    """
+    One SMTP relay/account. Keeps its connection open between messages and
+    paces itself with an interval that shrinks on clean acceptance and
+    doubles when the server pushes back. error is set once the relay refused
+    our login, sender or connection; it is not used again after that.
+    """
+
+    def __init__(self, name, smtp_server, smtp_port, sender_email, password,
+                 initial_interval=60.0, min_interval=1.0, max_interval=600.0):
+        self.name = name
+        self.smtp_server = smtp_server
+        self.smtp_port = smtp_port
+        self.sender_email = sender_email
+        self.password = password
+        self.interval = initial_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.next_allowed = 0.0
+        self.server = None
+        self.error = None
+
+    def connect(self):
+        if self.smtp_port == 465:
+            server = _SMTP_SSL(self.smtp_server, 465)
+        else:
+            server = _SMTP(self.smtp_server, self.smtp_port)
+            server.starttls()
+        server.login(self.sender_email, self.password)
+        self.server = server
+
+    def send(self, msg):
+        if self.server is None:
+            self.connect()
+        self.server.data_started = False
+        try:
+            self.server.send_message(msg)
+        except OSError as e:
+            # A reply from the server is definite; only a connection lost once DATA went out is not
+            lost = isinstance(e, smtplib.SMTPServerDisconnected) or not isinstance(e, smtplib.SMTPException)
+            if lost and self.server.data_started:
+                raise DeliveryUnknown(str(e)) from e
+            raise
+
+    def reset(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except Exception:
+                pass
+        self.server = None
+
+    def accepted(self):
+        self.interval = max(self.min_interval, self.interval * 0.9)
+
+    def throttled(self):
+        self.interval = min(self.max_interval, self.interval * 2)
+
+def relays_from_config(outreach_config):
+    """
+    Builds relays from outreach.relays, falling back to the single
+    smtp_server/sender_email account configured at the top level.
+    """
+    scheduler_config = outreach_config.get('scheduler', {})
+    min_interval = scheduler_config.get('relay_min_interval', 1.0)
+    max_interval = scheduler_config.get('max_interval', 600.0)
+    entries = outreach_config.get('relays') or [{
+        'smtp_server': outreach_config['smtp_server'],
+        'smtp_port': outreach_config['smtp_port'],
+        'sender_email': outreach_config['sender_email'],
+    }]
+
+    relays = []
+    for i, entry in enumerate(entries):
+        password_env = entry.get('password_env', 'SMTP_PASSWORD')
+        relays.append(Relay(
+            name=entry.get('name', f"relay{i}"),
+            smtp_server=entry['smtp_server'],
+            smtp_port=entry.get('smtp_port', 465),
+            sender_email=entry['sender_email'],
+            password=os.environ.get(password_env, 'password_placeholder'),
+            initial_interval=entry.get('delay_seconds', outreach_config.get('delay_seconds', 60)),
+            min_interval=min_interval,
+            max_interval=max_interval
+        ))
+    return relays
+
+# Refusals of the connection, login or envelope sender say nothing about the recipient
+RELAY_ERRORS = (smtplib.SMTPAuthenticationError, smtplib.SMTPSenderRefused,
+                smtplib.SMTPConnectError, smtplib.SMTPHeloError)
+
+def classify_error(error):
+    """
+    Maps an exception raised by Relay.send to an outcome.
+    """
+    if isinstance(error, DeliveryUnknown):
+        return UNKNOWN
+    if isinstance(error, RELAY_ERRORS) and error.smtp_code >= 500:
+        return RELAY_ERROR
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        return DEFERRED if codes and all(400 <= c < 500 for c in codes) else REJECTED
+    if isinstance(error, smtplib.SMTPResponseException):
+        return DEFERRED if 400 <= error.smtp_code < 500 else REJECTED
+    # Disconnects, timeouts and socket errors (smtplib's included) are worth another try
+    if isinstance(error, OSError):
+        return DEFERRED
+    return ERROR
+
+def is_relay_pushback(error):
+    """
+    421 and dropped connections are the relay throttling us as a whole,
+    rather than one recipient domain deferring.
+    """
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code == 421
+    return not isinstance(error, smtplib.SMTPRecipientsRefused)
+
+class _Domain:
+    def __init__(self, interval):
+        self.queue = deque()
+        self.in_flight = 0
+        self.interval = interval
+        self.next_allowed = 0.0
+        self.scheduled = False
+
+class SendScheduler:
+    """
+    Sends a batch of candidates across several relays (one worker thread each)
+    while capping concurrency and rate per recipient domain. Domains that
+    answer with 4xx/421 are slowed down; domains that accept speed back up.
+    """
+
+    def __init__(self, relays, per_domain_concurrency=2, domain_interval=5.0,
+                 min_interval=1.0, max_interval=600.0, max_deferrals=3):
+        self.relays = relays
+        self.per_domain_concurrency = per_domain_concurrency
+        self.domain_interval = domain_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_deferrals = max_deferrals
+
+    @classmethod
+    def from_config(cls, outreach_config, relays=None):
+        scheduler_config = outreach_config.get('scheduler', {})
+        return cls(
+            relays if relays is not None else relays_from_config(outreach_config),
+            per_domain_concurrency=scheduler_config.get('per_domain_concurrency', 2),
+            domain_interval=scheduler_config.get('domain_interval', 5.0),
+            min_interval=scheduler_config.get('min_interval', 1.0),
+            max_interval=scheduler_config.get('max_interval', 600.0),
+            max_deferrals=scheduler_config.get('max_deferrals', 3)
+        )
+
+    def healthy_relays(self):
+        """Relays that have not been stopped by a login, sender or connection refusal."""
+        return [relay for relay in self.relays if relay.error is None]
+
+    def run(self, candidates, build_message, on_result=None, on_start=None, on_deferred=None):
+        """
+        Delivers candidates and returns a list of (email, success, error, outcome).
+        build_message(candidate, relay) must return an EmailMessage.
+        on_result, if given, is called with each result as it happens.
+        on_start(email) is called just before each SMTP transaction, and
+        on_deferred(email) when a recipient is put back to retry later.
+        A relay that refuses our account is stopped and its recipients go to
+        the others; once none is left, everyone still waiting is returned
+        with outcome RELAY_ERROR.
+        """
+        self._cond = threading.Condition()
+        self._domains = {}
+        self._heap = []
+        self._results = []
+        self._deferrals = {}
+        self._remaining = 0
+        self._on_result = on_result
+        self._on_start = on_start
+        self._on_deferred = on_deferred
+
+        for candidate in candidates:
+            domain = candidate['email'].rsplit('@', 1)[-1].lower()
+            state = self._domains.get(domain)
+            if state is None:
+                state = self._domains[domain] = _Domain(self.domain_interval)
+            state.queue.append(candidate)
+            self._remaining += 1
+        for domain in self._domains:
+            self._schedule(domain)
+
+        relays = self.healthy_relays()
+        self._healthy = len(relays)
+        if not relays:
+            self._abandon("no healthy relay")
+        workers = [
+            threading.Thread(target=self._worker, args=(relay, build_message), name=f"send-{relay.name}")
+            for relay in relays
+        ]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        for relay in relays:
+            relay.reset()
+        return self._results
+    def _schedule(self, domain):
+        state = self._domains[domain]
+        if state.queue and not state.scheduled and state.in_flight < self.per_domain_concurrency:
+            state.scheduled = True
+            heapq.heappush(self._heap, (state.next_allowed, domain))
+
+    def _take(self, now):
+        """
+        Returns (domain, candidate) ready to send, or (None, seconds_to_wait).
+        """
+        while self._heap:
+            ready_at, domain = self._heap[0]
+            state = self._domains[domain]
+            if state.next_allowed > ready_at:
+                # Backed off since it was scheduled: move it to its real slot
+                heapq.heapreplace(self._heap, (state.next_allowed, domain))
+                continue
+            if ready_at > now:
+                return None, ready_at - now
+            heapq.heappop(self._heap)
+            state.scheduled = False
+            candidate = state.queue.popleft()
+            state.in_flight += 1
+            state.next_allowed = now + state.interval
+            self._schedule(domain)
+            return domain, candidate
+        return None, None
+
+    def _worker(self, relay, build_message):
+        while True:
+            with self._cond:
+                while True:
+                    if self._remaining == 0 or relay.error is not None:
+                        self._cond.notify_all()
+                        return
+                    domain, item = self._take(time.monotonic())
+                    if domain is not None:
+                        candidate = item
+                        break
+                    # Nothing ready: wait for the next domain slot or for a send to finish
+                    self._cond.wait(timeout=item if item is not None else 1.0)
+
+            delay = relay.next_allowed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            error = None
+            try:
+                msg = build_message(candidate, relay)
+            except Exception as e:
+                # The template or this candidate's data: nothing to do with the relay
+                error, outcome = e, ERROR
+            else:
+                try:
+                    if self._on_start:
+                        self._on_start(candidate['email'])
+                    relay.send(msg)
+                    outcome = ACCEPTED
+                except Exception as e:
+                    error = e
+                    outcome = classify_error(e)
+                    if outcome != REJECTED:
+                        relay.reset()
+                relay.next_allowed = time.monotonic() + relay.interval
+
+            with self._cond:
+                self._finish(relay, domain, candidate, outcome, error)
+                self._cond.notify_all()
+
+    def _finish(self, relay, domain, candidate, outcome, error):
+        state = self._domains[domain]
+        state.in_flight -= 1
+        email = candidate['email']
+
+        if outcome == ACCEPTED:
+            relay.accepted()
+            state.interval = max(self.min_interval, state.interval * 0.8)
+            self._record(email, True, None, outcome)
+        elif outcome == DEFERRED:
+            if is_relay_pushback(error):
+                relay.throttled()
+            state.interval = min(self.max_interval, state.interval * 2)
+            state.next_allowed = time.monotonic() + state.interval
+            self._deferrals[email] = self._deferrals.get(email, 0) + 1
+            logger.warning(f"Deferred {email} via {relay.name} ({error}); {domain} interval now {state.interval:.1f}s")
+            if self._deferrals[email] < self.max_deferrals:
+                state.queue.append(candidate)
+                if self._on_deferred:
+                    self._on_deferred(email)
+            else:
+                self._record(email, False, str(error), outcome)
+        elif outcome == RELAY_ERROR:
+            relay.error = error
+            self._healthy -= 1
+            logger.error(f"Stopped relay {relay.name}: {error}")
+            # Not the recipient's doing: no domain backoff, and first in line for another relay
+            state.queue.appendleft(candidate)
+            if self._on_deferred:
+                self._on_deferred(email)
+            if self._healthy == 0:
+                self._abandon(f"no healthy relay ({error})")
+        elif outcome == UNKNOWN:
+            logger.warning(f"Lost {relay.name} after DATA for {email}; delivery unknown ({error})")
+            self._record(email, False, str(error), outcome)
+        elif outcome == ERROR:
+            logger.error(f"Could not send to {email}: {error!r}")
+            self._record(email, False, repr(error), outcome)
+        else:
+            logger.error(f"Rejected {email} via {relay.name}: {error}")
+            self._record(email, False, str(error), outcome)
+
+        self._schedule(domain)
+
+    def _abandon(self, reason):
+        """Returns every candidate still waiting, unattempted, as RELAY_ERROR."""
+        self._heap.clear()
+        for state in self._domains.values():
+            state.scheduled = False
+            while state.queue:
+                self._record(state.queue.popleft()['email'], False, reason, RELAY_ERROR)
+
+    def _record(self, email, success, error, outcome):
+        self._remaining -= 1
+        result = (email, success, error, outcome)
+        self._results.append(result)
+        if self._on_result:
+            self._on_result(result)
@@ -0,0 +1,85 @@
+import os
+import json
+
+WHITESPACE = ' \t\n\r'
+
+def iter_json_array(path, chunk_size=1 << 20):
+    """
+    Yields the elements of a top-level JSON array file one at a time,
+    reading chunk_size characters at a time instead of loading the whole file.
+    The buffer is walked with an index and only trimmed when it is refilled,
+    so each element costs one decode rather than a copy of the buffer.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r') as f:
+        buffer, pos, eof = '', 0, False
+        started = False
+
+        def refill():
+            nonlocal buffer, pos, eof
+            # Read at least as much as is buffered so an element larger than
+            # chunk_size is retried a logarithmic number of times
+            chunk = f.read(max(chunk_size, len(buffer) - pos))
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+
+        while True:
+            while pos < len(buffer) and (buffer[pos] in WHITESPACE or (started and buffer[pos] == ',')):
+                pos += 1
+            if pos == len(buffer):
+                if eof:
+                    raise ValueError(f"{path} ends before its JSON array is closed")
+                refill()
+                continue
+            if not started:
+                if buffer[pos] != '[':
+                    raise ValueError(f"{path} does not contain a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                refill()
+                continue
+            if end == len(buffer) and not eof:
+                # A number at the very end of the buffer may continue in the next chunk
+                refill()
+                continue
+            yield item
+            pos = end
+
+class JsonArrayWriter:
+    """
+    Writes a JSON array one element at a time; the file is moved into place on close.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.count = 0
+        self._f = open(self.tmp_path, 'w')
+        self._f.write("[")
+
+    def write(self, item):
+        self._f.write(("," if self.count else "") + "\n" + json.dumps(item))
+        self.count += 1
+
+    def close(self):
+        self._f.write("\n]\n")
+        self._f.close()
+        os.replace(self.tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._f.close()
+            os.remove(self.tmp_path)
@@ -0,0 +1,569 @@
+"""
+Durable work queue, so pipeline stages can be spread over worker processes
+on any number of machines.
+
+An agent (the producer) splits its stage into tasks under one group id,
+enqueues them and waits for the group with run_group (or iter_group, to
+store each result as it arrives), working tasks itself in the meantime so a
+stage always finishes even with no workers running.
+worker.py processes lease tasks from the same queue, run them and
+acknowledge them with their result.
+
+A lease lasts visibility_timeout seconds and is extended while the handler
+runs. A lease that is not acknowledged in time (the worker died or hung)
+expires and the task goes to another worker, up to max_attempts leases,
+after which it is dead. Delivery is therefore at-least-once; tasks that must
+never run twice (email sends) are enqueued with max_attempts=1.
+
+Backends: SQLiteQueue (default, one database file on a volume every node
+sees) and MemoryQueue (in-process stand-in for tests). Any class with the
+QueueBackend methods can be plugged in with queue.backend: "module:Class".
+"""
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import contextlib
+import importlib
+import threading
+
+from utils.campaign import BASE_DIR, SHARED_DATA_DIR, Campaign
+
+QUEUE_PATH = os.path.join(SHARED_DATA_DIR, "queue.db")
+
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+DEAD = 'dead'
+
+logger = logging.getLogger(__name__)
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+class Task:
+    def __init__(self, id, group, kind, payload, campaign=None, state=PENDING, attempts=0,
+                 max_attempts=1, token=None, result=None, error=None):
+        self.id = id
+        self.group = group
+        self.kind = kind
+        self.payload = payload
+        self.campaign = campaign
+        self.state = state
+        self.attempts = attempts
+        self.max_attempts = max_attempts
+        self.token = token
+        self.result = result
+        self.error = error
+
+    def __repr__(self):
+        return f"Task({self.id}, {self.kind}, {self.state}, attempt {self.attempts}/{self.max_attempts})"
+
+class QueueBackend:
+    """
+    The operations a queue backend provides. Payloads and results must be
+    JSON-serializable; ack, extend and fail only succeed for the current lease.
+    """
+
+    def __init__(self, visibility_timeout=300.0, max_attempts=5, retry_delay=5.0, clock=time.time):
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.clock = clock
+
+    def _backoff(self, attempts):
+        return min(300.0, self.retry_delay * 2 ** max(attempts - 1, 0))
+
+    def enqueue(self, group, kind, payloads, campaign=None, max_attempts=None):
+        """Adds one task per payload and returns their ids."""
+        raise NotImplementedError
+
+    def lease(self, kinds=None, group=None, worker=None, visibility_timeout=None):
+        """Leases the oldest available task (optionally of the given kinds/group), or returns None."""
+        raise NotImplementedError
+
+    def extend(self, task, visibility_timeout=None):
+        """Pushes the lease deadline out; False if the lease was lost."""
+        raise NotImplementedError
+
+    def ack(self, task, result=None):
+        """Marks a leased task done with its result; False if the lease was lost."""
+        raise NotImplementedError
+
+    def fail(self, task, error):
+        """Returns a leased task to the queue after a backoff, or marks it dead when out of attempts."""
+        raise NotImplementedError
+
+    def cancel(self, group):
+        """Marks the group's tasks that were never leased dead and returns them."""
+        raise NotImplementedError
+
+    def counts(self, group=None):
+        """{state: count}, for one group or the whole queue."""
+        raise NotImplementedError
+
+    def results(self, group):
+        """The group's tasks in enqueue order, with state, result and error."""
+        raise NotImplementedError
+
+    def finished(self, group):
+        """The group's done and dead tasks in enqueue order, with result and error."""
+        raise NotImplementedError
+
+    def remove(self, task):
+        """Deletes one task, e.g. once its result has been stored."""
+        raise NotImplementedError
+
+    def purge(self, group=None, older_than=None):
+        """Deletes a group's tasks, or finished tasks last updated before older_than."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class SQLiteQueue(QueueBackend):
+    """
+    Tasks in one SQLite table. Leasing runs in an IMMEDIATE transaction, so
+    concurrent processes never lease the same task.
+    """
+
+    def __init__(self, path=QUEUE_PATH, **options):
+        super().__init__(**options)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        # Lease heartbeats share the connection with the thread running the task
+        self.lock = threading.Lock()
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                grp TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                campaign TEXT,
+                payload TEXT NOT NULL,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                available_at REAL NOT NULL,
+                lease_until REAL,
+                token TEXT,
+                worker TEXT,
+                result TEXT,
+                error TEXT,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_tasks_state ON tasks(state, available_at, id);
+            CREATE INDEX IF NOT EXISTS idx_tasks_grp ON tasks(grp, state);
+        ''')
+
+    def close(self):
+        self.conn.close()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        self.conn.execute('COMMIT')
+
+    def _expire(self, conn, now):
+        # Expired leases are another attempt used up
+        conn.execute(
+            "UPDATE tasks SET state = ?, error = 'lease expired', token = NULL, updated_at = ? "
+            "WHERE state = ? AND lease_until < ? AND attempts >= max_attempts",
+            (DEAD, now, LEASED, now)
+        )
+        conn.execute(
+            "UPDATE tasks SET state = ?, error = 'lease expired', token = NULL, available_at = ?, updated_at = ? "
+            "WHERE state = ? AND lease_until < ?",
+            (PENDING, now, now, LEASED, now)
+        )
+
+    def enqueue(self, group, kind, payloads, campaign=None, max_attempts=None):
+        now = self.clock()
+        attempts = max_attempts or self.max_attempts
+        ids = []
+        with self.lock, self._transaction() as conn:
+            for payload in payloads:
+                cursor = conn.execute(
+                    'INSERT INTO tasks (grp, kind, campaign, payload, state, max_attempts, available_at, updated_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (group, kind, campaign, json.dumps(payload), PENDING, attempts, now, now)
+                )
+                ids.append(cursor.lastrowid)
+        return ids
+
+    def lease(self, kinds=None, group=None, worker=None, visibility_timeout=None):
+        now = self.clock()
+        query = 'SELECT id FROM tasks WHERE state = ? AND available_at <= ?'
+        params = [PENDING, now]
+        if kinds:
+            query += f" AND kind IN ({','.join('?' * len(kinds))})"
+            params.extend(kinds)
+        if group is not None:
+            query += ' AND grp = ?'
+            params.append(group)
+        query += ' ORDER BY id LIMIT 1'
+
+        token = uuid.uuid4().hex
+        with self.lock, self._transaction() as conn:
+            self._expire(conn, now)
+            row = conn.execute(query, params).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                'UPDATE tasks SET state = ?, attempts = attempts + 1, token = ?, worker = ?, lease_until = ?, '
+                'updated_at = ? WHERE id = ?',
+                (LEASED, token, worker or worker_name(), now + (visibility_timeout or self.visibility_timeout),
+                 now, row[0])
+            )
+            row = conn.execute(
+                'SELECT id, grp, kind, campaign, payload, attempts, max_attempts FROM tasks WHERE id = ?', (row[0],)
+            ).fetchone()
+        return Task(row[0], row[1], row[2], json.loads(row[4]), campaign=row[3], state=LEASED,
+                    attempts=row[5], max_attempts=row[6], token=token)
+
+    def _update_leased(self, task, assignments, params):
+        with self.lock:
+            cursor = self.conn.execute(
+                f'UPDATE tasks SET {assignments}, updated_at = ? WHERE id = ? AND token = ? AND state = ?',
+                (*params, self.clock(), task.id, task.token, LEASED)
+            )
+        return cursor.rowcount == 1
+
+    def extend(self, task, visibility_timeout=None):
+        return self._update_leased(
+            task, 'lease_until = ?', (self.clock() + (visibility_timeout or self.visibility_timeout),)
+        )
+
+    def ack(self, task, result=None):
+        return self._update_leased(
+            task, 'state = ?, result = ?, error = NULL, token = NULL', (DONE, json.dumps(result))
+        )
+
+    def fail(self, task, error):
+        if task.attempts >= task.max_attempts:
+            return self._update_leased(task, 'state = ?, error = ?, token = NULL', (DEAD, str(error)))
+        return self._update_leased(
+            task, 'state = ?, error = ?, token = NULL, available_at = ?',
+            (PENDING, str(error), self.clock() + self._backoff(task.attempts))
+        )
+
+    def cancel(self, group):
+        with self.lock, self._transaction() as conn:
+            rows = conn.execute(
+                'SELECT id, kind, campaign, payload FROM tasks WHERE grp = ? AND state = ? AND attempts = 0',
+                (group, PENDING)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE tasks SET state = ?, error = 'cancelled', updated_at = ? WHERE id = ?",
+                ((DEAD, self.clock(), row[0]) for row in rows)
+            )
+        return [Task(row[0], group, row[1], json.loads(row[3]), campaign=row[2], state=DEAD, error='cancelled')
+                for row in rows]
+
+    def counts(self, group=None):
+        now = self.clock()
+        with self.lock, self._transaction() as conn:
+            self._expire(conn, now)
+            if group is None:
+                rows = conn.execute('SELECT state, count(*) FROM tasks GROUP BY state').fetchall()
+            else:
+                rows = conn.execute('SELECT state, count(*) FROM tasks WHERE grp = ? GROUP BY state', (group,)).fetchall()
+        counts = dict.fromkeys((PENDING, LEASED, DONE, DEAD), 0)
+        counts.update(rows)
+        return counts
+
+    def results(self, group):
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT id, kind, campaign, payload, state, attempts, max_attempts, result, error '
+                'FROM tasks WHERE grp = ? ORDER BY id', (group,)
+            ).fetchall()
+        return [self._finished_task(group, row) for row in rows]
+
+    def finished(self, group):
+        with self.lock, self._transaction() as conn:
+            self._expire(conn, self.clock())
+            rows = conn.execute(
+                'SELECT id, kind, campaign, payload, state, attempts, max_attempts, result, error '
+                'FROM tasks WHERE grp = ? AND state IN (?, ?) ORDER BY id', (group, DONE, DEAD)
+            ).fetchall()
+        return [self._finished_task(group, row) for row in rows]
+
+    @staticmethod
+    def _finished_task(group, row):
+        return Task(row[0], group, row[1], json.loads(row[3]), campaign=row[2], state=row[4], attempts=row[5],
+                    max_attempts=row[6], result=json.loads(row[7]) if row[7] is not None else None, error=row[8])
+
+    def remove(self, task):
+        with self.lock:
+            self.conn.execute('DELETE FROM tasks WHERE id = ?', (task.id,))
+
+    def purge(self, group=None, older_than=None):
+        with self.lock:
+            if group is not None:
+                cursor = self.conn.execute('DELETE FROM tasks WHERE grp = ?', (group,))
+            else:
+                cursor = self.conn.execute(
+                    'DELETE FROM tasks WHERE state IN (?, ?) AND updated_at < ?', (DONE, DEAD, older_than or 0)
+                )
+        return cursor.rowcount
+
+class MemoryQueue(QueueBackend):
+    """
+    The same semantics in process memory, for tests and single-process runs.
+    Pass a fake clock to exercise lease expiry without sleeping.
+    """
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.lock = threading.Lock()
+        self.tasks = {}
+        self.next_id = 1
+
+    def _expire(self, now):
+        for task in self.tasks.values():
+            if task.state == LEASED and task.lease_until < now:
+                task.state = DEAD if task.attempts >= task.max_attempts else PENDING
+                task.error = 'lease expired'
+                task.token = None
+                task.available_at = task.updated_at = now
+
+    def _current(self, task):
+        stored = self.tasks.get(task.id)
+        if stored is None or stored.state != LEASED or stored.token != task.token:
+            return None
+        return stored
+
+    def enqueue(self, group, kind, payloads, campaign=None, max_attempts=None):
+        ids = []
+        with self.lock:
+            for payload in payloads:
+                # Stored as JSON, like the SQLite backend, so tests catch unserializable payloads
+                task = Task(self.next_id, group, kind, json.loads(json.dumps(payload)), campaign=campaign,
+                            max_attempts=max_attempts or self.max_attempts)
+                task.available_at = task.updated_at = self.clock()
+                self.tasks[task.id] = task
+                ids.append(task.id)
+                self.next_id += 1
+        return ids
+
+    def lease(self, kinds=None, group=None, worker=None, visibility_timeout=None):
+        now = self.clock()
+        with self.lock:
+            self._expire(now)
+            for task in self.tasks.values():
+                if (task.state == PENDING and task.available_at <= now
+                        and (not kinds or task.kind in kinds) and (group is None or task.group == group)):
+                    task.state = LEASED
+                    task.attempts += 1
+                    task.token = uuid.uuid4().hex
+                    task.lease_until = now + (visibility_timeout or self.visibility_timeout)
+                    task.updated_at = now
+                    return Task(task.id, task.group, task.kind, json.loads(json.dumps(task.payload)),
+                                campaign=task.campaign, state=LEASED, attempts=task.attempts,
+                                max_attempts=task.max_attempts, token=task.token)
+        return None
+
+    def extend(self, task, visibility_timeout=None):
+        with self.lock:
+            stored = self._current(task)
+            if stored is None:
+                return False
+            stored.lease_until = self.clock() + (visibility_timeout or self.visibility_timeout)
+            return True
+
+    def ack(self, task, result=None):
+        with self.lock:
+            stored = self._current(task)
+            if stored is None:
+                return False
+            stored.state = DONE
+            stored.result = json.loads(json.dumps(result))
+            stored.error = None
+            stored.token = None
+            stored.updated_at = self.clock()
+            return True
+
+    def fail(self, task, error):
+        with self.lock:
+            stored = self._current(task)
+            if stored is None:
+                return False
+            stored.error = str(error)
+            stored.token = None
+            stored.updated_at = self.clock()
+            if stored.attempts >= stored.max_attempts:
+                stored.state = DEAD
+            else:
+                stored.state = PENDING
+                stored.available_at = self.clock() + self._backoff(stored.attempts)
+            return True
+
+    def cancel(self, group):
+        cancelled = []
+        with self.lock:
+            for task in self.tasks.values():
+                if task.group == group and task.state == PENDING and task.attempts == 0:
+                    task.state = DEAD
+                    task.error = 'cancelled'
+                    task.updated_at = self.clock()
+                    cancelled.append(task)
+        return cancelled
+
+    def counts(self, group=None):
+        counts = dict.fromkeys((PENDING, LEASED, DONE, DEAD), 0)
+        with self.lock:
+            self._expire(self.clock())
+            for task in self.tasks.values():
+                if group is None or task.group == group:
+                    counts[task.state] += 1
+        return counts
+
+    def results(self, group):
+        with self.lock:
+            return [task for task in self.tasks.values() if task.group == group]
+
+    def finished(self, group):
+        with self.lock:
+            self._expire(self.clock())
+            return [task for task in self.tasks.values() if task.group == group and task.state in (DONE, DEAD)]
+
+    def remove(self, task):
+        with self.lock:
+            self.tasks.pop(task.id, None)
+
+    def purge(self, group=None, older_than=None):
+        with self.lock:
+            if group is not None:
+                doomed = [task.id for task in self.tasks.values() if task.group == group]
+            else:
+                doomed = [task.id for task in self.tasks.values()
+                          if task.state in (DONE, DEAD) and task.updated_at < (older_than or 0)]
+            for task_id in doomed:
+                del self.tasks[task_id]
+        return len(doomed)
+
+BACKENDS = {
+    'sqlite': SQLiteQueue,
+    'memory': MemoryQueue
+}
+
+def open_queue(queue_config=None):
+    """
+    Builds the queue described by the `queue:` config section. backend is
+    "sqlite", "memory" or "package.module:Class" for another implementation.
+    """
+    queue_config = queue_config or {}
+    backend = queue_config.get('backend', 'sqlite')
+    options = {
+        'visibility_timeout': queue_config.get('visibility_timeout', 300),
+        'max_attempts': queue_config.get('max_attempts', 5),
+        'retry_delay': queue_config.get('retry_delay', 5)
+    }
+    if backend == 'sqlite':
+        path = queue_config.get('path') or QUEUE_PATH
+        return SQLiteQueue(os.path.join(BASE_DIR, path), **options)
+    if backend in BACKENDS:
+        return BACKENDS[backend](**options)
+    module_name, _, class_name = backend.partition(':')
+    return getattr(importlib.import_module(module_name), class_name)(**options)
+
+def new_group(stage):
+    return f"{stage}-{uuid.uuid4().hex[:12]}"
+
+class _Heartbeat:
+    """Extends a task's lease every third of the visibility timeout while it runs."""
+
+    def __init__(self, queue, task):
+        self.queue = queue
+        self.task = task
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f"lease-{task.id}", daemon=True)
+
+    def _run(self):
+        interval = max(self.queue.visibility_timeout / 3, 0.05)
+        while not self.stopped.wait(interval):
+            if not self.queue.extend(self.task):
+                logger.warning(f"Lost the lease on {self.task!r}")
+                return
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+
+def process_one(queue, handlers, kinds=None, group=None, worker=None):
+    """
+    Leases one task whose kind has a handler, runs handler(payload, campaign)
+    with the Campaign the task was enqueued for, and acknowledges the result. Returns the task, or None when nothing was available.
+    """
+    task = queue.lease(kinds=kinds or list(handlers), group=group, worker=worker)
+    if task is None:
+        return None
+    handler = handlers[task.kind]
+    try:
+        with _Heartbeat(queue, task):
+            result = handler(task.payload, Campaign(task.campaign))
+    except Exception as e:
+        logger.error(f"{task!r} failed: {e}")
+        queue.fail(task, e)
+        return task
+    if not queue.ack(task, result):
+        # Someone else holds it now; their result wins
+        logger.warning(f"{task!r} finished after its lease expired; result discarded")
+    return task
+
+def run_group(queue, group, handlers, poll_interval=1.0):
+    """
+    Works the group's tasks in this process alongside any workers until none
+    are pending or leased, then returns its tasks (state, result, error) in
+    enqueue order.
+    """
+    while True:
+        if process_one(queue, handlers, group=group) is not None:
+            continue
+        counts = queue.counts(group)
+        if not counts[PENDING] and not counts[LEASED]:
+            return queue.results(group)
+        time.sleep(poll_interval)
+
+def iter_group(queue, group, handlers, poll_interval=1.0):
+    """
+    Like run_group, but yields each task as soon as it is done or dead and
+    only deletes it once the caller asks for the next one, so a result
+    leaves the queue after the caller has stored it. Tasks come in the order
+    they finish.
+    """
+    while True:
+        worked = process_one(queue, handlers, group=group) is not None
+        for task in queue.finished(group):
+            yield task
+            queue.remove(task)
+        if worked:
+            continue
+        counts = queue.counts(group)
+        if not counts[PENDING] and not counts[LEASED]:
+            # Anything that finished since the last look
+            for task in queue.finished(group):
+                yield task
+                queue.remove(task)
+            return
+        time.sleep(poll_interval)
+
+def queue_from_config(config):
+    """The queue agents should hand their work to, or None when queue.enabled is off."""
+    queue_config = config.get('queue') or {}
+    return open_queue(queue_config) if queue_config.get('enabled') else None
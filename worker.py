@@ -0,0 +1,81 @@
+"""
+Pipeline worker: leases tasks from the shared work queue and runs them.
+
+Start any number of these, on any machine that shares the queue database
+and the campaigns/ and config/ directories:
+
+    python worker.py                                  # every task kind
+    python worker.py --kinds validation.verify        # only mailbox probes
+    python worker.py --burst                          # exit once the queue is empty
+
+Agents enqueue tasks when queue.enabled is set in config/settings.yaml.
+"""
+import os
+import sys
+import time
+import signal
+import logging
+import argparse
+import importlib
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.campaign import Campaign
+from utils.logging_setup import setup_logging
+from utils.work_queue import open_queue, process_one
+
+setup_logging("worker")
+logger = logging.getLogger("Worker")
+
+# Task kind -> (module, handler); imported on first use so a worker only
+# needs the dependencies of the stages it runs
+HANDLERS = {
+    "discovery.fetch": ("agents.discovery_agent", "fetch_task"),
+    "profiling.extract": ("agents.profiling_agent", "extract_task"),
+    "validation.verify": ("agents.validation_agent", "verify_task"),
+    "outreach.send": ("agents.outreach_agent", "send_task"),
+}
+
+# Finished tasks whose producer never collected them are dropped after a week
+PRUNE_AFTER = 7 * 86400
+
+class LazyHandlers(dict):
+    def __missing__(self, kind):
+        module_name, function = HANDLERS[kind]
+        handler = self[kind] = getattr(importlib.import_module(module_name), function)
+        return handler
+
+def main():
+    parser = argparse.ArgumentParser(description="Run pipeline tasks from the work queue")
+    parser.add_argument("--kinds", nargs="+", choices=sorted(HANDLERS), default=sorted(HANDLERS))
+    parser.add_argument("--burst", action="store_true", help="exit when no task is available")
+    args = parser.parse_args()
+
+    queue_config = Campaign().load_config().get('queue', {})
+    queue = open_queue(queue_config)
+    poll_interval = queue_config.get('poll_interval', 1.0)
+    handlers = LazyHandlers()
+
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+
+    queue.purge(older_than=time.time() - PRUNE_AFTER)
+    logger.info(f"Worker started for {', '.join(args.kinds)}")
+    processed = 0
+    try:
+        while not stopping:
+            task = process_one(queue, handlers, kinds=args.kinds)
+            if task is not None:
+                processed += 1
+                continue
+            if args.burst:
+                break
+            time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        queue.close()
+    logger.info(f"Worker stopped after {processed} tasks")
+
+if __name__ == "__main__":
+    main()